@@ -0,0 +1,34 @@
+"""Microbenchmark of token verification in the auth dependency.
+
+Run from the repository root: python -m benchmarks.bench_auth
+"""
+
+import os
+import timeit
+
+os.environ.setdefault("ENV_STATE", "test")
+
+from socialapi import security  # noqa: E402
+
+NUMBER = 20_000
+
+
+def verify(token: str) -> str:
+    return security.get_subject_for_token_type(token, "access")
+
+
+def uncached(token: str) -> str:
+    security.token_cache.clear()
+    return verify(token)
+
+
+def main() -> None:
+    token = security.create_access_token("bench@example.com")
+
+    for name, func in (("uncached", uncached), ("cached", verify)):
+        seconds = timeit.timeit(lambda: func(token), number=NUMBER)
+        print(f"{name:>10}: {seconds / NUMBER * 1e6:8.2f} us per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Cold import time of the app, as a new worker pays it, from -X importtime.
+
+Run from the repository root: python -m benchmarks.bench_import [module]
+"""
+
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+MODULE = "socialapi.main"
+REPEAT = 5
+TOP = 15
+
+
+def import_times(module: str) -> list[tuple[int, int, str]]:
+    # (self us, cumulative us, indented module name) per imported module
+    env = {**os.environ, "ENV_STATE": os.environ.get("ENV_STATE", "test")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():  # header line
+            continue
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def main() -> None:
+    module = sys.argv[1] if len(sys.argv) > 1 else MODULE
+
+    totals = []
+    by_package = defaultdict(int)
+    for _ in range(REPEAT):
+        rows = import_times(module)
+        total = next(
+            cumulative for _, cumulative, name in rows if name.strip() == module
+        )
+        totals.append(total)
+        for self_us, _, name in rows:
+            by_package[name.strip().split(".")[0]] += self_us
+
+    totals.sort()
+    print(f"import {module}: median {totals[len(totals) // 2] / 1000:.1f} ms")
+    print(f"slowest top-level packages (self time, mean of {REPEAT} runs):")
+    ranked = sorted(by_package.items(), key=lambda item: item[1], reverse=True)
+    for package, self_us in ranked[:TOP]:
+        print(f"{package:>24}: {self_us / REPEAT / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
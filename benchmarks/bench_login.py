@@ -0,0 +1,53 @@
+"""Login latency (one password verification) for each hashing setting.
+
+Run from the repository root: python -m benchmarks.bench_login
+"""
+
+import os
+import time
+
+os.environ.setdefault("ENV_STATE", "test")
+
+from socialapi.security import build_crypt_context  # noqa: E402
+
+PASSWORD = "NotSecure123!"
+REPEAT = 5
+
+SETTINGS = [
+    ("bcrypt rounds=10", ["bcrypt"], {"bcrypt_rounds": 10}),
+    ("bcrypt rounds=11", ["bcrypt"], {"bcrypt_rounds": 11}),
+    ("bcrypt rounds=12", ["bcrypt"], {"bcrypt_rounds": 12}),
+    ("bcrypt rounds=13", ["bcrypt"], {"bcrypt_rounds": 13}),
+    ("argon2 t=2 m=19MiB", ["argon2"], {"time_cost": 2, "memory_cost": 19456}),
+    ("argon2 t=3 m=64MiB", ["argon2"], {"time_cost": 3, "memory_cost": 65536}),
+]
+
+
+def measure(schemes: list[str], options: dict) -> float:
+    context = build_crypt_context(
+        schemes,
+        bcrypt_rounds=options.get("bcrypt_rounds", 12),
+        argon2_time_cost=options.get("time_cost", 3),
+        argon2_memory_cost=options.get("memory_cost", 65536),
+        argon2_parallelism=4,
+    )
+    hashed = context.hash(PASSWORD)
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        context.verify(PASSWORD, hashed)
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main() -> None:
+    for name, schemes, options in SETTINGS:
+        try:
+            seconds = measure(schemes, options)
+        except Exception as e:  # argon2-cffi is optional
+            print(f"{name:>20}: skipped ({e})")
+            continue
+        print(f"{name:>20}: {seconds * 1000:8.1f} ms per login")
+
+
+if __name__ == "__main__":
+    main()
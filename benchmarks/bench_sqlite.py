@@ -0,0 +1,111 @@
+"""Concurrent /like + GET /post throughput on a SQLite file, with the old
+rollback-journal defaults and with the configured PRAGMAs (WAL etc.).
+
+Run from the repository root: python -m benchmarks.bench_sqlite
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+WORKERS = 20
+DURATION_SECONDS = 5.0
+
+MODES = {
+    # sqlite3 defaults, i.e. before the PRAGMAs were configurable
+    "rollback journal": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_CACHE_SIZE": "-2000",
+        "SQLITE_BUSY_TIMEOUT_MS": "5000",
+    },
+    "configured (WAL)": {},
+}
+
+
+async def run_workload() -> None:
+    from httpx import ASGITransport, AsyncClient
+
+    from socialapi.config import config
+    from socialapi.database import database, user_table
+    from socialapi.main import app
+    from socialapi.migrate import upgrade
+    from socialapi.security import get_hash_password
+
+    upgrade()
+    config.WRITE_RATE_LIMITS = {}
+    await database.connect()
+    transport = ASGITransport(app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        user = {"email": "bench@example.com", "password": "NotSecure123!"}
+        await database.execute(
+            user_table.insert().values(
+                email=user["email"],
+                password=get_hash_password(user["password"]),
+                confirmed=True,
+            )
+        )
+        response = await client.post(
+            "/token", data={"username": user["email"], "password": user["password"]}
+        )
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        post_ids = []
+        for i in range(WORKERS):
+            response = await client.post(
+                "/post", json={"body": f"Post {i}"}, headers=headers
+            )
+            post_ids.append(response.json()["id"])
+
+        requests = errors = 0
+        deadline = time.perf_counter() + DURATION_SECONDS
+
+        # Each worker toggles its like on one post and reads the feed
+        async def worker(post_id: int):
+            nonlocal requests, errors
+            while time.perf_counter() < deadline:
+                for response in [
+                    await client.post(
+                        "/like", json={"post_id": post_id}, headers=headers
+                    ),
+                    await client.get("/post"),
+                    await client.delete(f"/like?post_id={post_id}", headers=headers),
+                    await client.get("/post"),
+                ]:
+                    requests += 1
+                    errors += response.status_code >= 500
+
+        await asyncio.gather(*(worker(post_id) for post_id in post_ids))
+    await database.disconnect()
+    print(f"{requests / DURATION_SECONDS:8.1f} req/s ({errors} errors)")
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        asyncio.run(run_workload())
+        return
+
+    for name, pragmas in MODES.items():
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                "ENV_STATE": "test",
+                "TEST_DATABASE_URL": f"sqlite:///{directory}/bench.db",
+                "TEST_DB_FORCE_ROLL_BACK": "false",
+                **{f"TEST_{key}": value for key, value in pragmas.items()},
+            }
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_sqlite", "--child"],
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+        output = result.stdout.strip() or result.stderr.strip().splitlines()[-1]
+        print(f"{name:>20}: {output}")
+
+
+if __name__ == "__main__":
+    main()
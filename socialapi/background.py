@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import signal
+import threading
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+# Periodic jobs started in the lifespan (e.g. flushing the like buffer)
+_periodic_tasks: list[asyncio.Task] = []
+
+
+async def _run_periodically(
+    name: str, interval: float, func: Callable[[], Awaitable]
+) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await func()
+        except Exception:
+            # Keep the loop alive, the next run may succeed
+            logger.exception(f"Periodic task '{name}' failed")
+
+
+def start_periodic_task(
+    name: str, interval: float, func: Callable[[], Awaitable]
+) -> asyncio.Task:
+    logger.debug(f"Starting periodic task '{name}' every {interval}s")
+    task = asyncio.create_task(_run_periodically(name, interval, func), name=name)
+    _periodic_tasks.append(task)
+    return task
+
+
+async def stop_periodic_tasks() -> None:
+    for task in _periodic_tasks:
+        task.cancel()
+    await asyncio.gather(*_periodic_tasks, return_exceptions=True)
+    _periodic_tasks.clear()
+
+
+# One-off work scheduled by requests (emails, image generation). It runs in
+# its own asyncio tasks rather than FastAPI's BackgroundTasks: those run
+# inside the request task, which uvicorn waits for (or cancels) before the
+# lifespan shutdown even starts, so there would be nothing left to drain.
+class BackgroundWork:
+    def __init__(self):
+        self.draining = False
+        self._running: set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._running)
+
+    def ensure_accepting(self) -> None:
+        # Check before writing anything the background work depends on
+        if self.draining:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is shutting down, please retry",
+                headers={"Retry-After": "5"},
+            )
+
+    def add(self, func: Callable[..., Awaitable], *args, **kwargs) -> asyncio.Task:
+        self.ensure_accepting()
+        task = asyncio.create_task(self._run(func, *args, **kwargs))
+        # The event loop only keeps weak references to tasks
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+        return task
+
+    async def _run(self, func: Callable[..., Awaitable], *args, **kwargs) -> None:
+        try:
+            await func(*args, **kwargs)
+        except Exception:
+            # Nobody awaits these tasks, so log failures here
+            logger.exception(f"Background task '{func.__name__}' failed")
+
+    def start_draining(self) -> None:
+        if not self.draining:
+            logger.info("Shutdown requested, no longer accepting background work")
+        self.draining = True
+
+    # Start refusing work as soon as the server is told to stop, while
+    # in-flight requests are still being answered. Chains the handlers the
+    # server installed (uvicorn sets its own for the duration of serve()).
+    def drain_on_shutdown_signal(self) -> None:
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            previous = signal.getsignal(sig)
+
+            def handler(signum, frame, previous=previous):
+                self.start_draining()
+                if callable(previous):
+                    previous(signum, frame)
+
+            signal.signal(sig, handler)
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for pending work without cancelling it, True if it all finished."""
+        if not self._running:
+            return True
+        _, still_running = await asyncio.wait(set(self._running), timeout=timeout)
+        return not still_running
+
+    async def drain(self, timeout: float) -> bool:
+        """Stop accepting work and wait for what is pending, True if it all finished."""
+        self.start_draining()
+        logger.info(f"Draining {self.pending} background task(s)")
+        if await self.wait(timeout):
+            return True
+
+        logger.warning(
+            f"{self.pending} background task(s) still running after {timeout}s, "
+            "cancelling"
+        )
+        running = list(self._running)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        return False
+
+
+background_work = BackgroundWork()
@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -16,10 +16,103 @@ class GlobalConfig(BaseConfig):
     MAILGUN_API_KEY: Optional[str] = None
     MAILGUN_DOMAIN: Optional[str] = None
     DB_FORCE_ROLL_BACK: bool = False
+    # Production server, see socialapi/serve.py. Workers default to the CPU count
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: Optional[int] = None
+    SERVER_BACKLOG: int = 2048
+    # Longer than the usual 60s load balancer idle timeout, so the proxy closes first
+    SERVER_KEEP_ALIVE_SECONDS: int = 65
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS: int = 30
+    # Proxies trusted for X-Forwarded-For, so rate limits key on the real client IP.
+    # Comma-separated addresses or networks of the load balancer, "*" for any.
+    SERVER_FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+    # How long shutdown waits for emails and image generation still running
+    BACKGROUND_DRAIN_TIMEOUT_SECONDS: float = 25.0
+    SERVER_LIMIT_CONCURRENCY: Optional[int] = None
+    # /readyz fails when the database doesn't answer in time or the worker is saturated
+    HEALTH_DB_TIMEOUT_SECONDS: float = 1.0
+    READINESS_MAX_POOL_UTILIZATION: float = 0.9
+    READINESS_MAX_BACKGROUND_TASKS: int = 100
+    # Upload request bodies over this size are cut off with 413
+    UPLOAD_MAX_BYTES: int = 25 * 1024 * 1024
+    UPLOAD_ALLOWED_CONTENT_TYPES: list[str] = [
+        "image/jpeg",
+        "image/png",
+        "image/gif",
+        "image/webp",
+        "video/mp4",
+    ]
+    # Uploads handled at once per worker, more get 503
+    UPLOAD_MAX_CONCURRENT: int = 8
+    # Resumable uploads: chunk size (B2 parts are at least 5 MB) and largest file
+    UPLOAD_CHUNK_BYTES: int = 8 * 1024 * 1024
+    UPLOAD_RESUMABLE_MAX_BYTES: int = 5 * 1024 * 1024 * 1024
+    UPLOAD_SESSION_TTL_SECONDS: int = 86400
+    UPLOAD_SESSION_PURGE_INTERVAL_SECONDS: float = 3600.0
+    # Variants generated for uploaded images, see socialapi/libs/images
+    IMAGE_PROCESSING_WORKERS: Optional[int] = None  # defaults to the CPU count
+    IMAGE_THUMBNAIL_SIZE: int = 320  # longest side in pixels
+    IMAGE_DISPLAY_SIZE: int = 1600
+    IMAGE_JPEG_QUALITY: int = 80
+    # PRAGMAs run on every SQLite connection, see benchmarks/bench_sqlite.py
+    SQLITE_JOURNAL_MODE: Literal["DELETE", "TRUNCATE", "PERSIST", "WAL"] = "WAL"
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # bytes
+    SQLITE_CACHE_SIZE: int = -64_000  # negative means KiB, so ~64 MB
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
     B2_KEY_ID: Optional[str] = None
     B2_APPLICATION_KEY: Optional[str] = None
     B2_BUCKET_NAME: Optional[str] = None
     DEEPAI_API_KEY: Optional[str] = None
+    # Minimum time between two emails with the same purpose to one address
+    EMAIL_RESEND_COOLDOWN_SECONDS: int = 300
+    # Stored responses for Idempotency-Key retries
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: float = 3600.0
+    # A claim with no stored response is abandoned after this, longer than any request
+    IDEMPOTENCY_LEASE_SECONDS: int = 60
+    # Write-behind buffering of likes
+    LIKE_BUFFER_ENABLED: bool = False
+    LIKE_BUFFER_FLUSH_INTERVAL_SECONDS: float = 1.0
+    LIKE_BUFFER_MAX_SIZE: int = 500
+    # Popular ranking job
+    RANKING_HALF_LIFE_HOURS: float = 24.0
+    RANKING_REFRESH_INTERVAL_SECONDS: float = 60.0
+    # Likes younger than this wait for the next run, so ids that commit out of
+    # order are not skipped
+    RANKING_SETTLE_SECONDS: float = 30.0
+    # Authors with more followers are merged into timelines on read instead
+    TIMELINE_FANOUT_MAX_FOLLOWERS: int = 10_000
+    TIMELINE_BACKFILL_POSTS: int = 50
+    # Verified JWTs kept in memory, 0 disables the cache
+    TOKEN_CACHE_SIZE: int = 10_000
+    REVOCATION_SYNC_INTERVAL_SECONDS: float = 30.0
+    # Threads for bcrypt hashing, defaults to the number of CPUs
+    PASSWORD_HASHING_WORKERS: Optional[int] = None
+    # Password hashing schemes and cost, see benchmarks/bench_login.py
+    PASSWORD_SCHEMES: list[str] = ["bcrypt"]
+    BCRYPT_ROUNDS: int = 12
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536  # KiB
+    ARGON2_PARALLELISM: int = 4
+    # Login attempts allowed per client IP and per username (token buckets)
+    LOGIN_RATE_LIMIT_IP_BURST: int = 20
+    LOGIN_RATE_LIMIT_IP_PER_MINUTE: float = 10
+    LOGIN_RATE_LIMIT_USER_BURST: int = 5
+    LOGIN_RATE_LIMIT_USER_PER_MINUTE: float = 5
+    RATE_LIMIT_EVICT_INTERVAL_SECONDS: float = 300.0
+    # Writes allowed per minute and per user on each route
+    WRITE_RATE_LIMITS: dict[str, float] = {
+        "/post": 30,
+        "/comment": 60,
+        "/like": 120,
+        "/upload": 10,
+        # Resumable upload chunks, the most specific route wins
+        "/upload/sessions": 600,
+    }
+    WRITE_RATE_LIMIT_BURST: int = 10
+    WRITE_RATE_LIMIT_IP_MULTIPLIER: float = 5
 
 
 class DevConfig(GlobalConfig):
@@ -30,6 +123,8 @@ class TestConfig(GlobalConfig):
     # Use an in-memory SQLite database for tests
     DATABASE_URL: str = "sqlite:///test.db"  # Ensure tests use a test database
     DB_FORCE_ROLL_BACK: bool = True
+    BCRYPT_ROUNDS: int = 4  # Cheapest bcrypt cost to keep tests fast
+    RANKING_SETTLE_SECONDS: float = 0  # Rank likes inserted by the test right away
     model_config = SettingsConfigDict(env_prefix="TEST_")
 
 
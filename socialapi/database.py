@@ -1,3 +1,5 @@
+import sqlite3
+
 import databases
 import sqlalchemy
 
@@ -6,8 +8,9 @@ from socialapi.config import config
 
 # Using Encode Databases for async database connections
 
-# --- Create database schema and engine ---
-# metadata object to hold our table definitions
+# --- Database schema ---
+# metadata object to hold our table definitions. Tables are created by
+# socialapi.migrate, never on import.
 metadata = sqlalchemy.MetaData()
 
 post_table = sqlalchemy.Table(
@@ -17,6 +20,9 @@ post_table = sqlalchemy.Table(
     sqlalchemy.Column("body", sqlalchemy.String),
     sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
     sqlalchemy.Column("image_url", sqlalchemy.String),
+    sqlalchemy.Column("thumbnail_url", sqlalchemy.String),
+    # Profile pages read one author's posts newest first as an index range
+    sqlalchemy.Index("ix_post_user_id_id", "user_id", "id"),
 )
 
 # Users table for authentication purposes
@@ -27,6 +33,10 @@ user_table = sqlalchemy.Table(
     sqlalchemy.Column("email", sqlalchemy.String, unique=True),
     sqlalchemy.Column("password", sqlalchemy.String),
     sqlalchemy.Column("confirmed", sqlalchemy.Boolean, default=False),
+    # Denormalized so create_post can choose fan-out-on-write without a count query
+    sqlalchemy.Column(
+        "follower_count", sqlalchemy.Integer, nullable=False, server_default="0"
+    ),
 )
 
 comment_table = sqlalchemy.Table(
@@ -44,18 +54,195 @@ like_table = sqlalchemy.Table(
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("post.id"), nullable=False),
     sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    # default too, since SQLite can't add a column with a CURRENT_TIMESTAMP default
+    sqlalchemy.Column(
+        "created_at",
+        sqlalchemy.DateTime,
+        default=sqlalchemy.func.now(),
+        server_default=sqlalchemy.func.now(),
+    ),
+    # Liked-state lookups and unlikes filter by user first, then post
+    sqlalchemy.Index("ix_likes_user_id_post_id", "user_id", "post_id"),
+    # Like counts of a page of posts, an index range per post
+    sqlalchemy.Index("ix_likes_post_id", "post_id"),
 )
 
-engine = sqlalchemy.create_engine(
-    # Use connect_args only for SQLite
-    config.DATABASE_URL,
-    connect_args={"check_same_thread": False},
+# Last time an email was sent per (email, purpose), used to deduplicate sends
+email_dispatch_table = sqlalchemy.Table(
+    "email_dispatch",
+    metadata,
+    sqlalchemy.Column("email", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("purpose", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("sent_at", sqlalchemy.DateTime, nullable=False),
+)
+
+# Revoked access/refresh token ids, kept until the token would expire anyway
+revoked_token_table = sqlalchemy.Table(
+    "revoked_token",
+    metadata,
+    sqlalchemy.Column("jti", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("expires_at", sqlalchemy.DateTime, nullable=False),
 )
 
-metadata.create_all(engine)
+# Responses of writes sent with an Idempotency-Key, replayed on retries.
+# status_code is NULL while the first request is still running.
+idempotency_key_table = sqlalchemy.Table(
+    "idempotency_key",
+    metadata,
+    sqlalchemy.Column("subject", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("key", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("request_path", sqlalchemy.String, nullable=False),
+    # SHA-256 of the request body, a reused key must come with the same body
+    sqlalchemy.Column("request_hash", sqlalchemy.String),
+    sqlalchemy.Column("status_code", sqlalchemy.Integer),
+    sqlalchemy.Column("response_body", sqlalchemy.Text),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, nullable=False),
+)
+
+# Files already stored in B2 by content hash, so repeat uploads are not sent again
+upload_table = sqlalchemy.Table(
+    "uploads",
+    metadata,
+    sqlalchemy.Column("sha256", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("size", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("file_url", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("thumbnail_url", sqlalchemy.String),
+    sqlalchemy.Column("display_url", sqlalchemy.String),
+    sqlalchemy.Column(
+        "created_at",
+        sqlalchemy.DateTime,
+        default=sqlalchemy.func.now(),
+        server_default=sqlalchemy.func.now(),
+    ),
+)
+
+# Resumable uploads, each backed by a B2 large file. file_url is set on completion.
+upload_session_table = sqlalchemy.Table(
+    "upload_session",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    sqlalchemy.Column("file_name", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("content_type", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("size", sqlalchemy.BigInteger, nullable=False),
+    sqlalchemy.Column("chunk_size", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("b2_file_id", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("file_url", sqlalchemy.String),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, nullable=False),
+)
+
+# Chunks of a resumable upload already stored as B2 parts
+upload_part_table = sqlalchemy.Table(
+    "upload_part",
+    metadata,
+    sqlalchemy.Column(
+        "session_id", sqlalchemy.ForeignKey("upload_session.id"), primary_key=True
+    ),
+    sqlalchemy.Column("part_number", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("size", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("sha1", sqlalchemy.String, nullable=False),
+)
+
+# Follow graph: follower_id follows followee_id
+follow_table = sqlalchemy.Table(
+    "follows",
+    metadata,
+    sqlalchemy.Column(
+        "follower_id", sqlalchemy.ForeignKey("users.id"), primary_key=True
+    ),
+    sqlalchemy.Column(
+        "followee_id", sqlalchemy.ForeignKey("users.id"), primary_key=True
+    ),
+    sqlalchemy.Index("ix_follows_followee_id", "followee_id"),
+)
+
+# Home timelines filled by fan-out-on-write, read as a (user_id, post_id) range
+timeline_table = sqlalchemy.Table(
+    "timeline",
+    metadata,
+    sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("post.id"), primary_key=True),
+    sqlalchemy.Column("author_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+)
+
+# Materialized time-decayed popularity, refreshed by socialapi.ranking
+post_score_table = sqlalchemy.Table(
+    "post_score",
+    metadata,
+    sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("post.id"), primary_key=True),
+    sqlalchemy.Column("score", sqlalchemy.Float, nullable=False, index=True),
+)
+
+# Progress of the ranking job (last like already folded into post_score)
+ranking_state_table = sqlalchemy.Table(
+    "ranking_state",
+    metadata,
+    sqlalchemy.Column("name", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("last_like_id", sqlalchemy.Integer, nullable=False),
+)
+
+
+# --- SQLite connection settings ---
+def sqlite_pragmas() -> list[str]:
+    return [
+        # First, so switching journal_mode waits on a locked database too
+        f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE)}",
+        f"PRAGMA cache_size={int(config.SQLITE_CACHE_SIZE)}",
+    ]
+
+
+# databases opens a new aiosqlite connection per acquire and has no init hook,
+# but it passes its options through to sqlite3.connect, which takes a factory
+class SQLitePragmaConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for pragma in sqlite_pragmas():
+            self.execute(pragma)
+
+
+def connection_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {"factory": SQLitePragmaConnection}
+    return {}
+
 
 # --- Database module for connecting to the database ---
 # using encode/databases for interacting with the database asynchronously
 database = databases.Database(
-    config.DATABASE_URL, force_rollback=config.DB_FORCE_ROLL_BACK
+    config.DATABASE_URL,
+    force_rollback=config.DB_FORCE_ROLL_BACK,
+    **connection_options(config.DATABASE_URL),
 )
+
+
+# --- Unique constraint violations ---
+# Only duplicate keys count, other integrity errors (NOT NULL, foreign keys)
+# are bugs and must propagate
+SQLITE_UNIQUE_ERRORS = ("SQLITE_CONSTRAINT_PRIMARYKEY", "SQLITE_CONSTRAINT_UNIQUE")
+
+try:
+    from asyncpg.exceptions import UniqueViolationError
+except ImportError:  # asyncpg is only installed for Postgres deployments
+    UniqueViolationError = None
+
+
+def is_unique_violation(error: BaseException) -> bool:
+    if isinstance(error, sqlite3.IntegrityError):
+        return getattr(error, "sqlite_errorname", None) in SQLITE_UNIQUE_ERRORS
+    return UniqueViolationError is not None and isinstance(error, UniqueViolationError)
+
+
+# Insert a row keyed by a unique constraint, False if it already exists. The
+# savepoint keeps an enclosing transaction usable after the conflict.
+async def insert_unless_exists(query) -> bool:
+    try:
+        async with database.transaction():
+            await database.execute(query)
+    except Exception as e:
+        if not is_unique_violation(e):
+            raise
+        return False
+    return True
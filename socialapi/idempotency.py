@@ -0,0 +1,229 @@
+import datetime
+import hashlib
+import logging
+from typing import Optional
+
+import sqlalchemy
+from fastapi import status
+from fastapi.responses import JSONResponse, Response
+
+from socialapi.config import config
+from socialapi.database import database, idempotency_key_table, is_unique_violation
+from socialapi.security import get_token_subject
+
+logger = logging.getLogger(__name__)
+
+# --- Idempotency-Key ---
+# Mobile clients retry writes on timeouts. When a write carries an
+# Idempotency-Key header, its response is stored per user and key, and retries
+# get the stored response back without running the endpoint again (no second
+# insert, no second background task). Keys expire after IDEMPOTENCY_KEY_TTL_SECONDS.
+
+IDEMPOTENT_PATHS = {"/post", "/comment", "/like"}
+
+
+def expiry_cutoff() -> datetime.datetime:
+    return datetime.datetime.now(datetime.UTC) - datetime.timedelta(
+        seconds=config.IDEMPOTENCY_KEY_TTL_SECONDS
+    )
+
+
+def lease_cutoff() -> datetime.datetime:
+    return datetime.datetime.now(datetime.UTC) - datetime.timedelta(
+        seconds=config.IDEMPOTENCY_LEASE_SECONDS
+    )
+
+
+def same_key(subject: str, key: str):
+    return sqlalchemy.and_(
+        idempotency_key_table.c.subject == subject,
+        idempotency_key_table.c.key == key,
+    )
+
+
+# A stored response until the key expires, or a claim still within its lease.
+# A request that crashed or was cancelled doesn't lock its key for the whole TTL.
+def is_live():
+    columns = idempotency_key_table.c
+    return sqlalchemy.and_(
+        columns.created_at > expiry_cutoff(),
+        sqlalchemy.or_(
+            columns.status_code.is_not(None), columns.created_at > lease_cutoff()
+        ),
+    )
+
+
+# The claim is identified by its timestamp, so a request that outlived its
+# lease can't save over or release the claim of the retry that took it over
+def same_claim(subject: str, key: str, claimed_at: datetime.datetime):
+    return sqlalchemy.and_(
+        same_key(subject, key), idempotency_key_table.c.created_at == claimed_at
+    )
+
+
+# Claim the key for a new request, returns the stored row if it was already used
+async def claim_key(
+    subject: str,
+    key: str,
+    path: str,
+    request_hash: Optional[str] = None,
+    claimed_at: Optional[datetime.datetime] = None,
+):
+    query = idempotency_key_table.select().where(same_key(subject, key), is_live())
+    stored = await database.fetch_one(query)
+    if stored:
+        return stored
+
+    try:
+        async with database.transaction():
+            # Drop an expired entry the purge job hasn't removed yet, or an
+            # abandoned claim
+            await database.execute(
+                idempotency_key_table.delete().where(
+                    same_key(subject, key), sqlalchemy.not_(is_live())
+                )
+            )
+            await database.execute(
+                idempotency_key_table.insert().values(
+                    subject=subject,
+                    key=key,
+                    request_path=path,
+                    request_hash=request_hash,
+                    created_at=claimed_at or datetime.datetime.now(datetime.UTC),
+                )
+            )
+    except Exception as e:
+        # A concurrent request claimed it first
+        if not is_unique_violation(e):
+            raise
+        return await database.fetch_one(query)
+
+    return None
+
+
+async def save_response(
+    subject: str,
+    key: str,
+    claimed_at: datetime.datetime,
+    status_code: int,
+    body: bytes,
+) -> None:
+    await database.execute(
+        idempotency_key_table.update()
+        .where(same_claim(subject, key, claimed_at))
+        .values(status_code=status_code, response_body=body.decode())
+    )
+
+
+# Forget the key so the client can retry a request that failed
+async def release_key(subject: str, key: str, claimed_at: datetime.datetime) -> None:
+    await database.execute(
+        idempotency_key_table.delete().where(same_claim(subject, key, claimed_at))
+    )
+
+
+async def purge_expired_keys() -> None:
+    await database.execute(
+        idempotency_key_table.delete().where(
+            idempotency_key_table.c.created_at <= expiry_cutoff()
+        )
+    )
+
+
+# The whole request body, or None if the client disconnected
+async def read_body(receive) -> Optional[bytes]:
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+def replay_response(stored, path: str, request_hash: str) -> Response:
+    # Keys claimed before request hashes were stored only have their path checked
+    if stored.request_path != path or stored.request_hash not in (None, request_hash):
+        return JSONResponse(
+            {"detail": "Idempotency-Key was already used for another request"},
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+        )
+    if stored.status_code is None:
+        return JSONResponse(
+            {"detail": "A request with this Idempotency-Key is still in progress"},
+            status_code=status.HTTP_409_CONFLICT,
+        )
+    return Response(
+        stored.response_body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+class IdempotencyMiddleware:
+    """Store and replay responses of writes sent with an Idempotency-Key."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in IDEMPOTENT_PATHS
+        ):
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        key = headers.get(b"idempotency-key", b"").decode()
+        # Keys are per user, anonymous requests are rejected by the route anyway
+        subject = get_token_subject(scope["headers"])
+        if not key or not subject:
+            return await self.app(scope, receive, send)
+
+        # The body is small JSON, read it up front to tell a retry from a
+        # different request sent with the same key
+        body = await read_body(receive)
+        if body is None:
+            return
+        request_hash = hashlib.sha256(body).hexdigest()
+
+        claimed_at = datetime.datetime.now(datetime.UTC)
+        stored = await claim_key(subject, key, scope["path"], request_hash, claimed_at)
+        if stored:
+            logger.info(f"Replaying response for Idempotency-Key on {scope['path']}")
+            replay = replay_response(stored, scope["path"], request_hash)
+            return await replay(scope, receive, send)
+
+        request = {"body_sent": False}
+
+        # Hand the buffered body to the app, then pass through (disconnects)
+        async def replay_receive():
+            if request["body_sent"]:
+                return await receive()
+            request["body_sent"] = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        response = {"status": None, "body": b"", "saved": False}
+
+        # Save the response before its last chunk goes out, so a retry finds it
+        async def send_and_capture(message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+                if not message.get("more_body") and response["status"] < 400:
+                    await save_response(
+                        subject, key, claimed_at, response["status"], response["body"]
+                    )
+                    response["saved"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_and_capture)
+        finally:
+            # Errors are not stored, the client may retry with the same key
+            if not response["saved"]:
+                await release_key(subject, key, claimed_at)
@@ -1,8 +1,8 @@
+import hashlib
+import io
 import logging
 from functools import lru_cache
 
-import b2sdk.v2 as b2
-
 from socialapi.config import config
 
 logger = logging.getLogger(__name__)
@@ -12,6 +12,9 @@ logger = logging.getLogger(__name__)
 @lru_cache()
 def get_b2_api():
     """Initialize and return a Backblaze B2 API client."""
+    # b2sdk takes ~100ms to import, only pay for it on the first upload
+    import b2sdk.v2 as b2
+
     logger.debug("Initializing Backblaze B2 API client.")
     info = b2.InMemoryAccountInfo()
     b2_api = b2.B2Api(info)
@@ -22,7 +25,7 @@ def get_b2_api():
 
 # Get bucket with caching
 @lru_cache()
-def get_b2_bucket(api: b2.B2Api):
+def get_b2_bucket(api):
     """Retrieve and return the Backblaze B2 bucket."""
     return api.get_bucket_by_name(config.B2_BUCKET_NAME)
 
@@ -45,3 +48,38 @@ def b2_upload_file(local_file: str, file_name: str):
         f"Uploaded file {local_file} to B2 successfully. Download URL: {download_url}"
     )
     return download_url
+
+
+# --- Large files, uploaded part by part (resumable uploads) ---
+# B2 parts are numbered from 1 and must be at least 5 MB, except the last one
+B2_MIN_PART_SIZE = 5_000_000
+
+
+def b2_start_large_file(file_name: str, content_type: str) -> str:
+    """Start a large file in the bucket and return its B2 file id."""
+    api = get_b2_api()
+    response = api.session.start_large_file(
+        get_b2_bucket(api).id_, file_name, content_type, {}
+    )
+    return response["fileId"]
+
+
+def b2_upload_part(file_id: str, part_number: int, data: bytes) -> str:
+    """Upload one part of a large file and return its SHA-1."""
+    sha1 = hashlib.sha1(data).hexdigest()
+    get_b2_api().session.upload_part(
+        file_id, part_number, len(data), sha1, io.BytesIO(data)
+    )
+    return sha1
+
+
+def b2_finish_large_file(file_id: str, part_sha1s: list[str]) -> str:
+    """Assemble the uploaded parts and return the download URL."""
+    api = get_b2_api()
+    api.session.finish_large_file(file_id, part_sha1s)
+    return api.get_download_url_for_fileid(file_id)
+
+
+def b2_cancel_large_file(file_id: str) -> None:
+    """Discard an unfinished large file and its parts."""
+    get_b2_api().session.cancel_large_file(file_id)
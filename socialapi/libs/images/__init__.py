@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from socialapi.config import config
+
+logger = logging.getLogger(__name__)
+
+
+# Variant name -> longest side in pixels
+def variant_sizes() -> dict[str, int]:
+    return {
+        "thumbnail": config.IMAGE_THUMBNAIL_SIZE,
+        "display": config.IMAGE_DISPLAY_SIZE,
+    }
+
+
+# Runs in a worker process. Returns {variant: path} with a JPEG per variant,
+# or {} when the file is not an image Pillow can read.
+def make_variants(path: str, sizes: dict[str, int], quality: int) -> dict[str, str]:
+    # Pillow is imported here so only the pool processes pay for it
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(path) as original:
+            # Apply the camera rotation, the EXIF data is not kept
+            image = ImageOps.exif_transpose(original).convert("RGB")
+    except (UnidentifiedImageError, OSError):
+        return {}
+
+    variants = {}
+    for name, size in sizes.items():
+        variant = image.copy()
+        variant.thumbnail((size, size))  # keeps the aspect ratio, never upscales
+        variant_path = f"{path}.{name}.jpg"
+        variant.save(
+            variant_path, "JPEG", quality=quality, optimize=True, progressive=True
+        )
+        variants[name] = variant_path
+    return variants
+
+
+# Spawned rather than forked: the app process already runs threads (aiosqlite,
+# hashing pool) that must not be copied into children mid-operation
+@lru_cache()
+def get_image_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=config.IMAGE_PROCESSING_WORKERS or os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def shutdown_image_pool() -> None:
+    if get_image_pool.cache_info().currsize:
+        get_image_pool().shutdown(cancel_futures=True)
+        get_image_pool.cache_clear()
+
+
+async def process_image(path: str) -> dict[str, str]:
+    """Generate the image variants of the file at path off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_image_pool(),
+        make_variants,
+        path,
+        variant_sizes(),
+        config.IMAGE_JPEG_QUALITY,
+    )
+
+
+def variant_file_name(file_name: str, variant: str) -> str:
+    stem, _ = os.path.splitext(file_name)
+    return f"{stem}_{variant}.jpg"
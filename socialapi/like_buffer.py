@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from collections import Counter
+
+from socialapi.config import config
+from socialapi.database import database, like_table
+
+logger = logging.getLogger(__name__)
+
+# --- Write-behind buffer for likes ---
+# During viral events every POST /like is a single-row insert on the same hot rows.
+# When LIKE_BUFFER_ENABLED is set, likes are queued in memory (deduplicated by
+# (post_id, user_id)) and written in batches on a timer, when the buffer is full
+# and on shutdown from the lifespan hook.
+
+
+class LikeBuffer:
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._pending: dict[tuple[int, int], dict] = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def add(self, post_id: int, user_id: int) -> None:
+        # A repeated like from the same user is collapsed into one row
+        self._pending.setdefault(
+            (post_id, user_id), {"post_id": post_id, "user_id": user_id}
+        )
+        if len(self._pending) >= self.max_size:
+            await self.flush()
+
+    # Waits out an in-flight flush, so a like it was writing is in likes by the
+    # time this returns False and the caller looks for the stored row
+    async def discard(self, post_id: int, user_id: int) -> bool:
+        async with self._lock:
+            return self._pending.pop((post_id, user_id), None) is not None
+
+    def is_pending(self, post_id: int, user_id: int) -> bool:
+        return (post_id, user_id) in self._pending
+
+    # Number of pending likes per post, merged into like counts on reads
+    def pending_counts(self) -> Counter:
+        return Counter(post_id for post_id, _ in self._pending)
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            batch = dict(self._pending)
+            logger.debug(f"Flushing {len(batch)} buffered likes")
+            async with database.transaction():
+                await database.execute_many(like_table.insert(), list(batch.values()))
+
+            # Only drop what was written; likes added meanwhile stay queued
+            for key in batch:
+                self._pending.pop(key, None)
+            return len(batch)
+
+
+like_buffer = LikeBuffer(max_size=config.LIKE_BUFFER_MAX_SIZE)
@@ -25,6 +25,12 @@ class EmailObfuscationFilter(logging.Filter):
 
 
 def configure_logging() -> None:
+    # rich is only worth its import time on a developer's terminal
+    if isinstance(config, DevConfig):
+        console_handler = "rich.logging.RichHandler"
+    else:
+        console_handler = "logging.StreamHandler"
+
     dictConfig(
         {
             "version": 1,  # to prevent errors
@@ -54,7 +60,7 @@ def configure_logging() -> None:
             },
             "handlers": {
                 "default": {
-                    "class": "rich.logging.RichHandler",  # Using RichHandler for better console output
+                    "class": console_handler,  # RichHandler for better console output in dev
                     "level": "DEBUG",  # The level will be controlled in the logger
                     "formatter": "console",
                     "filters": [
@@ -6,11 +6,29 @@ from asgi_correlation_id import CorrelationIdMiddleware
 from fastapi import FastAPI, HTTPException
 from fastapi.exception_handlers import http_exception_handler
 
+from socialapi.background import (
+    background_work,
+    start_periodic_task,
+    stop_periodic_tasks,
+)
+from socialapi.config import config
 from socialapi.database import database
+from socialapi.idempotency import IdempotencyMiddleware, purge_expired_keys
+from socialapi.libs.images import shutdown_image_pool
+from socialapi.like_buffer import like_buffer
 from socialapi.logging_conf import configure_logging
+from socialapi.ranking import refresh_post_scores
+from socialapi.ratelimit import WriteRateLimitMiddleware, evict_idle_rate_limits
+from socialapi.routers.follow import router as follow_router
+from socialapi.routers.health import router as health_router
 from socialapi.routers.post import router as post_router
+from socialapi.routers.search import router as search_router
 from socialapi.routers.upload import router as upload_router
+from socialapi.routers.upload_session import router as upload_session_router
 from socialapi.routers.user import router as user_router
+from socialapi.security import revocation_list
+from socialapi.upload_limits import UploadLimitMiddleware
+from socialapi.upload_sessions import check_chunk_size, purge_expired_upload_sessions
 
 # test logging
 logger = logging.getLogger(__name__)
@@ -20,20 +38,71 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     configure_logging()
+    check_chunk_size()
     logger.info("Starting up connection...")
     await database.connect()
+    await revocation_list.sync()
+    # Refuse new background work from the moment a shutdown is requested
+    background_work.drain_on_shutdown_signal()
+    if config.LIKE_BUFFER_ENABLED:
+        start_periodic_task(
+            "flush_like_buffer",
+            config.LIKE_BUFFER_FLUSH_INTERVAL_SECONDS,
+            like_buffer.flush,
+        )
+    start_periodic_task(
+        "refresh_post_scores",
+        config.RANKING_REFRESH_INTERVAL_SECONDS,
+        refresh_post_scores,
+    )
+    start_periodic_task(
+        "sync_revocation_list",
+        config.REVOCATION_SYNC_INTERVAL_SECONDS,
+        revocation_list.sync,
+    )
+    start_periodic_task(
+        "evict_rate_limits",
+        config.RATE_LIMIT_EVICT_INTERVAL_SECONDS,
+        evict_idle_rate_limits,
+    )
+    start_periodic_task(
+        "purge_idempotency_keys",
+        config.IDEMPOTENCY_PURGE_INTERVAL_SECONDS,
+        purge_expired_keys,
+    )
+    start_periodic_task(
+        "purge_upload_sessions",
+        config.UPLOAD_SESSION_PURGE_INTERVAL_SECONDS,
+        purge_expired_upload_sessions,
+    )
     yield
+    # Let emails and image generation finish while the database is still there
+    await background_work.drain(config.BACKGROUND_DRAIN_TIMEOUT_SECONDS)
+    await stop_periodic_tasks()
+    shutdown_image_pool()
+    # Write any buffered likes before losing the database connection
+    await like_buffer.flush()
     await database.disconnect()
 
 
 # The lifespan function is passed to FastAPI to manage startup and shutdown events
 app = FastAPI(lifespan=lifespan)
-# Add Correlation ID Middleware
+# Cap upload sizes and concurrent uploads before the body is parsed
+app.add_middleware(UploadLimitMiddleware)
+# Replay stored responses for retried writes
+app.add_middleware(IdempotencyMiddleware)
+# Reject abusive writers before they reach the routes
+app.add_middleware(WriteRateLimitMiddleware)
+# Add Correlation ID Middleware (added last so it wraps everything)
 app.add_middleware(CorrelationIdMiddleware)
 
 app.include_router(post_router)
 app.include_router(user_router)
 app.include_router(upload_router)
+app.include_router(upload_session_router)
+app.include_router(search_router)
+app.include_router(follow_router)
+app.include_router(health_router)
 
 
 # Global exception handler to log HTTPExceptions
@@ -0,0 +1,91 @@
+# Applies pending schema migrations. Run it before starting the app, workers
+# only connect:
+#
+#     python -m socialapi.migrate            # apply everything pending
+#     python -m socialapi.migrate --status   # list applied and pending versions
+import argparse
+import logging
+from typing import Optional
+
+import sqlalchemy
+
+from socialapi.config import config
+from socialapi.migrations import MIGRATIONS
+
+logger = logging.getLogger(__name__)
+
+schema_version_table = sqlalchemy.Table(
+    "schema_version",
+    sqlalchemy.MetaData(),
+    sqlalchemy.Column("version", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column(
+        "applied_at", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()
+    ),
+)
+
+
+def create_engine(url: Optional[str] = None):
+    url = url or config.DATABASE_URL
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    return sqlalchemy.create_engine(url, connect_args=connect_args)
+
+
+def applied_versions(engine) -> set[int]:
+    with engine.begin() as connection:
+        schema_version_table.create(connection, checkfirst=True)
+        return set(
+            connection.scalars(sqlalchemy.select(schema_version_table.c.version))
+        )
+
+
+def pending_versions(engine) -> list[int]:
+    applied = applied_versions(engine)
+    return [version for version in sorted(MIGRATIONS) if version not in applied]
+
+
+def upgrade(url: Optional[str] = None) -> list[int]:
+    engine = create_engine(url)
+    try:
+        applied = []
+        for version in pending_versions(engine):
+            logger.info(f"Applying migration {version:04d}")
+            MIGRATIONS[version](engine)
+            # Recorded only once the migration finished, a failed one reruns
+            with engine.begin() as connection:
+                connection.execute(
+                    schema_version_table.insert().values(version=version)
+                )
+            applied.append(version)
+        return applied
+    finally:
+        engine.dispose()
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m socialapi.migrate")
+    parser.add_argument(
+        "--status", action="store_true", help="show versions without applying"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.status:
+        engine = create_engine()
+        try:
+            applied = applied_versions(engine)
+        finally:
+            engine.dispose()
+        for version in sorted(MIGRATIONS):
+            state = "applied" if version in applied else "pending"
+            print(f"{version:04d} {state}")
+        return
+
+    applied = upgrade()
+    if applied:
+        print("Applied " + ", ".join(f"{version:04d}" for version in applied))
+    else:
+        print("Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
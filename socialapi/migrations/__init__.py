@@ -0,0 +1,22 @@
+# Schema migrations by version, applied in order by socialapi.migrate.
+# Each one takes an engine and manages its own transactions so long backfills
+# can commit in batches; keep them safe to re-run in case one is interrupted.
+from socialapi.migrations import (
+    m0001_baseline,
+    m0002_post_thumbnail_url,
+    m0003_uploads,
+    m0004_upload_sessions,
+    m0005_search_index_backfill,
+    m0006_idempotency_request_hash,
+    m0007_likes_post_id_index,
+)
+
+MIGRATIONS = {
+    1: m0001_baseline.upgrade,
+    2: m0002_post_thumbnail_url.upgrade,
+    3: m0003_uploads.upgrade,
+    4: m0004_upload_sessions.upgrade,
+    5: m0005_search_index_backfill.upgrade,
+    6: m0006_idempotency_request_hash.upgrade,
+    7: m0007_likes_post_id_index.upgrade,
+}
@@ -0,0 +1,153 @@
+# Baseline: everything the app used to create at import time. Also brings a
+# database created by an older import-time create_all up to date, adding the
+# columns and indexes that create_all could not add to existing tables.
+import sqlalchemy
+
+from socialapi.migrations.ops import add_column, backfill_in_batches, create_tables
+
+# The schema as of this migration. Copied rather than imported from
+# socialapi.database, which keeps changing: later columns and tables belong to
+# later migrations.
+metadata = sqlalchemy.MetaData()
+
+TABLES = [
+    sqlalchemy.Table(
+        "users",
+        metadata,
+        sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+        sqlalchemy.Column("email", sqlalchemy.String, unique=True),
+        sqlalchemy.Column("password", sqlalchemy.String),
+        sqlalchemy.Column("confirmed", sqlalchemy.Boolean),
+        sqlalchemy.Column(
+            "follower_count", sqlalchemy.Integer, nullable=False, server_default="0"
+        ),
+    ),
+    sqlalchemy.Table(
+        "post",
+        metadata,
+        sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+        sqlalchemy.Column("body", sqlalchemy.String),
+        sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+        sqlalchemy.Column("image_url", sqlalchemy.String),
+        sqlalchemy.Index("ix_post_user_id_id", "user_id", "id"),
+    ),
+    sqlalchemy.Table(
+        "comment",
+        metadata,
+        sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+        sqlalchemy.Column("body", sqlalchemy.String),
+        sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("post.id"), nullable=False),
+        sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    ),
+    sqlalchemy.Table(
+        "likes",
+        metadata,
+        sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+        sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("post.id"), nullable=False),
+        sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+        sqlalchemy.Column(
+            "created_at", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()
+        ),
+        sqlalchemy.Index("ix_likes_user_id_post_id", "user_id", "post_id"),
+    ),
+    sqlalchemy.Table(
+        "email_dispatch",
+        metadata,
+        sqlalchemy.Column("email", sqlalchemy.String, primary_key=True),
+        sqlalchemy.Column("purpose", sqlalchemy.String, primary_key=True),
+        sqlalchemy.Column("sent_at", sqlalchemy.DateTime, nullable=False),
+    ),
+    sqlalchemy.Table(
+        "revoked_token",
+        metadata,
+        sqlalchemy.Column("jti", sqlalchemy.String, primary_key=True),
+        sqlalchemy.Column("expires_at", sqlalchemy.DateTime, nullable=False),
+    ),
+    sqlalchemy.Table(
+        "idempotency_key",
+        metadata,
+        sqlalchemy.Column("subject", sqlalchemy.String, primary_key=True),
+        sqlalchemy.Column("key", sqlalchemy.String, primary_key=True),
+        sqlalchemy.Column("request_path", sqlalchemy.String, nullable=False),
+        sqlalchemy.Column("status_code", sqlalchemy.Integer),
+        sqlalchemy.Column("response_body", sqlalchemy.Text),
+        sqlalchemy.Column("created_at", sqlalchemy.DateTime, nullable=False),
+    ),
+    sqlalchemy.Table(
+        "follows",
+        metadata,
+        sqlalchemy.Column(
+            "follower_id", sqlalchemy.ForeignKey("users.id"), primary_key=True
+        ),
+        sqlalchemy.Column(
+            "followee_id", sqlalchemy.ForeignKey("users.id"), primary_key=True
+        ),
+        sqlalchemy.Index("ix_follows_followee_id", "followee_id"),
+    ),
+    sqlalchemy.Table(
+        "timeline",
+        metadata,
+        sqlalchemy.Column(
+            "user_id", sqlalchemy.ForeignKey("users.id"), primary_key=True
+        ),
+        sqlalchemy.Column(
+            "post_id", sqlalchemy.ForeignKey("post.id"), primary_key=True
+        ),
+        sqlalchemy.Column(
+            "author_id", sqlalchemy.ForeignKey("users.id"), nullable=False
+        ),
+    ),
+    sqlalchemy.Table(
+        "post_score",
+        metadata,
+        sqlalchemy.Column(
+            "post_id", sqlalchemy.ForeignKey("post.id"), primary_key=True
+        ),
+        sqlalchemy.Column("score", sqlalchemy.Float, nullable=False, index=True),
+    ),
+    sqlalchemy.Table(
+        "ranking_state",
+        metadata,
+        sqlalchemy.Column("name", sqlalchemy.String, primary_key=True),
+        sqlalchemy.Column("last_like_id", sqlalchemy.Integer, nullable=False),
+    ),
+]
+
+# Full-text index over post and comment bodies, maintained by socialapi.search.
+# SQLite uses an FTS5 virtual table, Postgres a generated tsvector with a GIN index.
+SEARCH_INDEX_DDL = {
+    "sqlite": [
+        (
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+            "body, kind UNINDEXED, ref_id UNINDEXED, post_id UNINDEXED)"
+        ),
+    ],
+    "postgresql": [
+        (
+            "CREATE TABLE IF NOT EXISTS search_index ("
+            "id SERIAL PRIMARY KEY, kind VARCHAR NOT NULL, ref_id INTEGER NOT NULL, "
+            "post_id INTEGER NOT NULL, body TEXT, tsv tsvector GENERATED ALWAYS AS "
+            "(to_tsvector('english', coalesce(body, ''))) STORED)"
+        ),
+        (
+            "CREATE INDEX IF NOT EXISTS ix_search_index_tsv "
+            "ON search_index USING GIN (tsv)"
+        ),
+    ],
+}
+
+
+def upgrade(engine):
+    create_tables(engine, TABLES)
+
+    add_column(engine, "users", "follower_count", "INTEGER NOT NULL DEFAULT 0")
+    add_column(engine, "likes", "created_at", "TIMESTAMP")
+    backfill_in_batches(
+        engine,
+        "UPDATE likes SET created_at = CURRENT_TIMESTAMP WHERE id IN "
+        "(SELECT id FROM likes WHERE created_at IS NULL LIMIT :batch_size)",
+    )
+
+    with engine.begin() as connection:
+        for statement in SEARCH_INDEX_DDL.get(engine.dialect.name, []):
+            connection.execute(sqlalchemy.text(statement))
@@ -0,0 +1,6 @@
+# Thumbnail of the image attached to a post, set by POST /upload?post_id=
+from socialapi.migrations.ops import add_column
+
+
+def upgrade(engine):
+    add_column(engine, "post", "thumbnail_url", "VARCHAR")
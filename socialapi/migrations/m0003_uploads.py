@@ -0,0 +1,23 @@
+# Content hashes of stored uploads, for deduplication
+import sqlalchemy
+
+from socialapi.migrations.ops import create_tables
+
+metadata = sqlalchemy.MetaData()
+
+upload_table = sqlalchemy.Table(
+    "uploads",
+    metadata,
+    sqlalchemy.Column("sha256", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("size", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("file_url", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("thumbnail_url", sqlalchemy.String),
+    sqlalchemy.Column("display_url", sqlalchemy.String),
+    sqlalchemy.Column(
+        "created_at", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()
+    ),
+)
+
+
+def upgrade(engine):
+    create_tables(engine, [upload_table])
@@ -0,0 +1,40 @@
+# Resumable upload sessions and their received chunks
+import sqlalchemy
+
+from socialapi.migrations.ops import create_tables
+
+metadata = sqlalchemy.MetaData()
+
+# Only referenced by the foreign key, created by the baseline
+sqlalchemy.Table(
+    "users", metadata, sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True)
+)
+
+upload_session_table = sqlalchemy.Table(
+    "upload_session",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    sqlalchemy.Column("file_name", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("content_type", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("size", sqlalchemy.BigInteger, nullable=False),
+    sqlalchemy.Column("chunk_size", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("b2_file_id", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("file_url", sqlalchemy.String),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, nullable=False),
+)
+
+upload_part_table = sqlalchemy.Table(
+    "upload_part",
+    metadata,
+    sqlalchemy.Column(
+        "session_id", sqlalchemy.ForeignKey("upload_session.id"), primary_key=True
+    ),
+    sqlalchemy.Column("part_number", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("size", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("sha1", sqlalchemy.String, nullable=False),
+)
+
+
+def upgrade(engine):
+    create_tables(engine, [upload_session_table, upload_part_table])
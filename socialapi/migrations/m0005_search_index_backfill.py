@@ -0,0 +1,60 @@
+# Index posts and comments written before full-text search existed. Newer rows
+# were indexed as they were created, so each kind is copied from just below
+# its lowest indexed id downwards. Every batch commits, and an interrupted run
+# resumes where it stopped because the indexed ids stay one contiguous range.
+import logging
+
+import sqlalchemy
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+# kind: (table, column holding the post id)
+SOURCES = {
+    "post": ("post", "id"),
+    "comment": ("comment", "post_id"),
+}
+
+INSERT_DOCUMENT = (
+    "INSERT INTO search_index (body, kind, ref_id, post_id) "
+    "VALUES (:body, :kind, :ref_id, :post_id)"
+)
+
+
+def backfill(engine, kind: str, table: str, post_id_column: str) -> int:
+    with engine.connect() as connection:
+        # A full scan of the index on SQLite (ref_id is UNINDEXED), done once
+        before = connection.scalar(
+            sqlalchemy.text("SELECT min(ref_id) FROM search_index WHERE kind = :kind"),
+            {"kind": kind},
+        )
+        if before is None:
+            before = connection.scalar(
+                sqlalchemy.text(f"SELECT coalesce(max(id), 0) + 1 FROM {table}")
+            )
+
+    select_batch = sqlalchemy.text(
+        f"SELECT id AS ref_id, {post_id_column} AS post_id, body FROM {table} "
+        "WHERE id < :before ORDER BY id DESC LIMIT :batch_size"
+    )
+    total = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select_batch, {"before": before, "batch_size": BATCH_SIZE}
+            ).all()
+            if not rows:
+                return total
+            connection.execute(
+                sqlalchemy.text(INSERT_DOCUMENT),
+                [{"kind": kind, **row._mapping} for row in rows],
+            )
+        before = rows[-1].ref_id
+        total += len(rows)
+        logger.debug(f"Indexed {total} existing {kind} rows")
+
+
+def upgrade(engine):
+    for kind, (table, post_id_column) in SOURCES.items():
+        backfill(engine, kind, table, post_id_column)
@@ -0,0 +1,6 @@
+# Hash of the request body an Idempotency-Key was first used with
+from socialapi.migrations.ops import add_column
+
+
+def upgrade(engine):
+    add_column(engine, "idempotency_key", "request_hash", "VARCHAR")
@@ -0,0 +1,20 @@
+# Like counts per post (profile pages, popular posts) read an index range on
+# likes.post_id instead of scanning the (user_id, post_id) index
+import sqlalchemy
+
+from socialapi.migrations.ops import create_tables
+
+metadata = sqlalchemy.MetaData()
+
+like_table = sqlalchemy.Table(
+    "likes",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("post_id", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Index("ix_likes_post_id", "post_id"),
+)
+
+
+def upgrade(engine):
+    # The table exists, so only the missing index is created
+    create_tables(engine, [like_table])
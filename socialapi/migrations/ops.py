@@ -0,0 +1,50 @@
+import logging
+
+import sqlalchemy
+
+logger = logging.getLogger(__name__)
+
+
+def has_column(connection, table_name: str, column_name: str) -> bool:
+    columns = sqlalchemy.inspect(connection).get_columns(table_name)
+    return any(column["name"] == column_name for column in columns)
+
+
+def create_tables(engine, tables: list[sqlalchemy.Table]):
+    # create_all skips existing tables entirely, so indexes added to an
+    # existing table later are created one by one
+    tables[0].metadata.create_all(engine, tables=tables, checkfirst=True)
+    for table in tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def add_column(engine, table_name: str, column_name: str, definition: str):
+    # definition is the raw column DDL, e.g. "INTEGER NOT NULL DEFAULT 0"
+    with engine.begin() as connection:
+        if has_column(connection, table_name, column_name):
+            return
+        logger.info(f"Adding column {table_name}.{column_name}")
+        connection.execute(
+            sqlalchemy.text(
+                f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}"
+            )
+        )
+
+
+def backfill_in_batches(engine, statement: str, batch_size: int = 1000) -> int:
+    """Run statement until it changes no rows, committing after every batch.
+
+    The statement must touch at most :batch_size rows and make progress each
+    time, so large tables are updated without one long write lock.
+    """
+    total = 0
+    while True:
+        with engine.begin() as connection:
+            result = connection.execute(
+                sqlalchemy.text(statement), {"batch_size": batch_size}
+            )
+        if result.rowcount <= 0:
+            return total
+        total += result.rowcount
+        logger.debug(f"Backfilled {total} rows")
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class UserPostIn(BaseModel):
@@ -16,11 +16,14 @@ class UserPost(UserPostIn):  # Class inheritance
     id: int
     user_id: int
     image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
 
 
 # Post with Likes
 class UserPostWithLikes(UserPost):
     likes: int
+    # Only set when the feed is requested by a logged-in user
+    liked_by_me: Optional[bool] = None
 
 
 # ----- Comments -----
@@ -60,5 +63,27 @@ class PostLike(PostLikeIn):
     model_config = ConfigDict(
         from_attributes=True
     )  # for Pydantic dealing with ORM objects
-    id: int
+    id: Optional[int] = None  # None while the like waits in the write-behind buffer
     user_id: int
+
+
+# ----- Batch requests -----
+# Upper bound on items per batch so a single request can't hold the writer forever
+MAX_BATCH_SIZE = 500
+
+
+class PostLikeBatchIn(BaseModel):
+    likes: list[PostLikeIn] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class CommentBatchIn(BaseModel):
+    comments: list[CommentIn] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+# Result for each item of a batch, in the same order as the request
+class BatchItemResult(BaseModel):
+    index: int
+    post_id: int
+    status_code: int
+    id: Optional[int] = None  # set when the item was created and has an id
+    detail: Optional[str] = None
@@ -0,0 +1,20 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class SearchResult(BaseModel):
+    model_config = ConfigDict(
+        from_attributes=True
+    )  # for Pydantic dealing with ORM objects
+    kind: Literal["post", "comment"]
+    ref_id: int  # id of the post or comment
+    post_id: int
+    body: str
+    rank: float  # lower is a better match
+
+
+class SearchPage(BaseModel):
+    results: list[SearchResult]
+    # Pass as ?cursor= to get the next page, None on the last page
+    next_cursor: Optional[str] = None
@@ -0,0 +1,19 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class UploadSessionIn(BaseModel):
+    file_name: str = Field(min_length=1)
+    content_type: str
+    size: int = Field(gt=0)  # bytes
+
+
+class UploadSession(UploadSessionIn):
+    id: str
+    chunk_size: int
+    part_count: int
+    # Chunk numbers already stored, clients resume by sending the others
+    parts_received: list[int]
+    # Set once the upload is complete
+    file_url: Optional[str] = None
@@ -11,3 +11,11 @@ class User(BaseModel):
 # input model for creating a user
 class UserIn(User):
     password: str
+
+
+class RefreshTokenIn(BaseModel):
+    refresh_token: str
+
+
+class EmailIn(BaseModel):
+    email: str
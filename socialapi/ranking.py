@@ -0,0 +1,134 @@
+import datetime
+import logging
+import math
+
+import sqlalchemy
+
+from socialapi.config import config
+from socialapi.database import (
+    database,
+    insert_unless_exists,
+    like_table,
+    post_score_table,
+    ranking_state_table,
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Time-decayed popularity ---
+# Every like is worth 2 ** ((liked_at - EPOCH) / half_life): a like from one
+# half-life ago counts half as much as a like now. Dividing all scores by the same
+# 2 ** (now / half_life) doesn't change the order, so old scores never need to be
+# decayed again and each run only folds in the likes added since the last one.
+# Scores are stored as log2 of that sum to stay within float range.
+# Unlikes are not subtracted, their weight fades out like any old like.
+
+EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+STATE_NAME = "popular"
+BATCH_SIZE = 5000
+
+
+# SQLite returns naive UTC timestamps
+def as_utc(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.UTC)
+    return value
+
+
+def like_weight(liked_at: datetime.datetime) -> float:
+    half_life = config.RANKING_HALF_LIFE_HOURS * 3600
+    return (as_utc(liked_at) - EPOCH).total_seconds() / half_life
+
+
+# log2(2 ** a + 2 ** b) without overflowing
+def add_log2(a: float | None, b: float) -> float:
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+async def refresh_post_scores() -> int:
+    """Fold likes added since the last run into post_score, returns likes processed"""
+    await insert_unless_exists(
+        ranking_state_table.insert().values(name=STATE_NAME, last_like_id=0)
+    )
+    processed = 0
+
+    while True:
+        # Likes whose ids are allocated but not yet committed can appear after
+        # higher ids (Postgres sequences), so the newest ones are left to settle
+        settled_before = datetime.datetime.now(datetime.UTC) - datetime.timedelta(
+            seconds=config.RANKING_SETTLE_SECONDS
+        )
+        count = await fold_next_batch(settled_before)
+        processed += count
+        if count < BATCH_SIZE:
+            break
+
+    logger.debug(f"Ranking refreshed with {processed} new likes")
+    return processed
+
+
+async def fold_next_batch(settled_before: datetime.datetime) -> int:
+    state = ranking_state_table.c
+    async with database.transaction():
+        # Every worker runs this job. Writing the state row first takes its
+        # lock, so concurrent runs queue here and each reads the progress
+        # saved by the previous one instead of folding the same likes again.
+        await database.execute(
+            ranking_state_table.update()
+            .where(state.name == STATE_NAME)
+            .values(last_like_id=state.last_like_id)
+        )
+        last_like_id = await database.fetch_val(
+            sqlalchemy.select(state.last_like_id).where(state.name == STATE_NAME)
+        )
+
+        query = (
+            sqlalchemy.select(
+                like_table.c.id, like_table.c.post_id, like_table.c.created_at
+            )
+            .where(like_table.c.id > last_like_id)
+            .order_by(like_table.c.id)
+            .limit(BATCH_SIZE)
+        )
+        likes = []
+        for like in await database.fetch_all(query):
+            if as_utc(like.created_at) > settled_before:
+                break
+            likes.append(like)
+        if not likes:
+            return 0
+
+        increments: dict[int, float] = {}
+        for like in likes:
+            increments[like.post_id] = add_log2(
+                increments.get(like.post_id), like_weight(like.created_at)
+            )
+
+        # Scores and progress are saved together so a failed run is simply retried
+        await save_scores(increments)
+        await database.execute(
+            ranking_state_table.update()
+            .where(state.name == STATE_NAME)
+            .values(last_like_id=likes[-1].id)
+        )
+    return len(likes)
+
+
+async def save_scores(increments: dict[int, float]) -> None:
+    query = post_score_table.select().where(post_score_table.c.post_id.in_(increments))
+    current = {row.post_id: row.score for row in await database.fetch_all(query)}
+
+    for post_id, increment in increments.items():
+        if post_id in current:
+            await database.execute(
+                post_score_table.update()
+                .where(post_score_table.c.post_id == post_id)
+                .values(score=add_log2(current[post_id], increment))
+            )
+        else:
+            await database.execute(
+                post_score_table.insert().values(post_id=post_id, score=increment)
+            )
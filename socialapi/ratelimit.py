@@ -0,0 +1,198 @@
+import abc
+import logging
+import math
+import time
+from collections import Counter
+from typing import Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+
+from socialapi.config import config
+from socialapi.security import get_token_subject
+
+logger = logging.getLogger(__name__)
+
+# Allowed/rejected counts per limiter, e.g. metrics["login_ip.rejected"]
+metrics: Counter = Counter()
+
+
+# --- Rate limit state ---
+# Limiters keep their state in a store. The in-memory store is per worker; a
+# shared store (e.g. backed by Redis) can be plugged in with set_rate_limit_store
+# so limits hold across workers.
+class RateLimitStore(abc.ABC):
+    @abc.abstractmethod
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        """Take one token from a bucket, returns 0 if allowed or seconds to wait"""
+
+    @abc.abstractmethod
+    async def take_gcra(self, key: str, emission_interval: float, burst: int) -> float:
+        """Generic cell rate algorithm, returns 0 if allowed or seconds to wait"""
+
+    async def evict(self, idle_seconds: float) -> None:
+        """Drop state not touched for idle_seconds"""
+
+    def clear(self) -> None:
+        """Forget all state"""
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    def __init__(self) -> None:
+        # key -> (tokens left, last update)
+        self._buckets: dict[str, tuple[float, float]] = {}
+        # key -> theoretical arrival time, a single float per key
+        self._arrival_times: dict[str, float] = {}
+
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            return 0
+        self._buckets[key] = (tokens, now)
+        return (1 - tokens) / refill_per_second
+
+    async def take_gcra(self, key: str, emission_interval: float, burst: int) -> float:
+        now = time.monotonic()
+        arrival_time = max(self._arrival_times.get(key, now), now)
+        allowed_at = arrival_time - emission_interval * (burst - 1)
+
+        if now < allowed_at:
+            return allowed_at - now
+        self._arrival_times[key] = arrival_time + emission_interval
+        return 0
+
+    async def evict(self, idle_seconds: float) -> None:
+        now = time.monotonic()
+        cutoff = now - idle_seconds
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if bucket[1] > cutoff
+        }
+        # An arrival time in the past behaves exactly like a new key
+        self._arrival_times = {
+            key: arrival_time
+            for key, arrival_time in self._arrival_times.items()
+            if arrival_time > now
+        }
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self._arrival_times.clear()
+
+
+rate_limit_store: RateLimitStore = InMemoryRateLimitStore()
+
+
+def set_rate_limit_store(store: RateLimitStore) -> None:
+    global rate_limit_store
+    rate_limit_store = store
+
+
+# Buckets idle this long have refilled completely and can be forgotten
+EVICT_IDLE_SECONDS = 3600
+
+
+async def evict_idle_rate_limits() -> None:
+    await rate_limit_store.evict(EVICT_IDLE_SECONDS)
+
+
+def too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests, please try again later",
+        headers={"Retry-After": str(math.ceil(retry_after))},
+    )
+
+
+# Token bucket: up to `burst` requests at once, refilled at per_minute
+async def take_token(name: str, key: str, burst: int, per_minute: float) -> float:
+    retry_after = await rate_limit_store.take(f"{name}:{key}", burst, per_minute / 60)
+    metrics[f"{name}.{'rejected' if retry_after else 'allowed'}"] += 1
+    return retry_after
+
+
+# --- Login ---
+# Checked before authenticate_user so rejected attempts never reach bcrypt
+async def check_login_rate_limit(ip: Optional[str], username: str) -> None:
+    retry_after = 0.0
+    # The server may not know the client address (e.g. a unix socket)
+    if ip is not None:
+        retry_after = await take_token(
+            "login_ip",
+            ip,
+            config.LOGIN_RATE_LIMIT_IP_BURST,
+            config.LOGIN_RATE_LIMIT_IP_PER_MINUTE,
+        )
+    if not retry_after:
+        retry_after = await take_token(
+            "login_user",
+            username.lower(),
+            config.LOGIN_RATE_LIMIT_USER_BURST,
+            config.LOGIN_RATE_LIMIT_USER_PER_MINUTE,
+        )
+
+    if retry_after:
+        logger.warning("Login rate limit exceeded", extra={"email": username})
+        raise too_many_requests(retry_after)
+
+
+# --- Write endpoints ---
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class WriteRateLimitMiddleware:
+    """Limit writes per user and per IP on the routes in WRITE_RATE_LIMITS.
+
+    Uses GCRA, which only keeps one timestamp per key. Requests over the limit
+    get 429 with Retry-After before reaching the route or the database.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            return await self.app(scope, receive, send)
+
+        # The most specific entry wins: /upload/sessions/... has its own limit,
+        # while /like/batch is limited together with /like
+        segments = scope["path"].strip("/").split("/")
+        for route in ("/" + "/".join(segments[:2]), "/" + segments[0]):
+            per_minute = config.WRITE_RATE_LIMITS.get(route)
+            if per_minute is not None:
+                break
+        else:
+            return await self.app(scope, receive, send)
+
+        emission_interval = 60 / per_minute
+        checks = []
+        if subject := get_token_subject(scope["headers"]):
+            checks.append(("write_user", f"{route}:{subject}", emission_interval))
+        if scope.get("client"):
+            # Several users can share an IP, so the IP gets a larger allowance
+            checks.append(
+                (
+                    "write_ip",
+                    f"{route}:{scope['client'][0]}",
+                    emission_interval / config.WRITE_RATE_LIMIT_IP_MULTIPLIER,
+                )
+            )
+
+        for name, key, interval in checks:
+            retry_after = await rate_limit_store.take_gcra(
+                f"{name}:{key}", interval, config.WRITE_RATE_LIMIT_BURST
+            )
+            metrics[f"{name}.{'rejected' if retry_after else 'allowed'}"] += 1
+            if retry_after:
+                logger.warning(f"Write rate limit exceeded on {route} ({name})")
+                response = JSONResponse(
+                    {"detail": "Too many requests, please try again later"},
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={"Retry-After": str(math.ceil(retry_after))},
+                )
+                return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,77 @@
+import logging
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from socialapi.database import database, post_table
+from socialapi.models.post import UserPostWithLikes
+from socialapi.models.user import User
+from socialapi.routers.post import (
+    add_liked_by_me,
+    merge_pending_likes,
+    select_post_and_likes,
+)
+from socialapi.security import get_current_user, get_user_by_id
+from socialapi.timeline import follow, get_timeline_post_ids, is_following, unfollow
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.post("/user/{user_id}/follow", status_code=201)
+async def follow_user(
+    user_id: int, current_user: Annotated[User, Depends(get_current_user)]
+):
+    if user_id == current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You can't follow yourself",
+        )
+
+    followee = await get_user_by_id(user_id)
+    if not followee:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if await is_following(current_user.id, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You already follow this user",
+        )
+
+    logger.info(f"User {current_user.id} follows user {user_id}")
+    await follow(current_user.id, followee)
+    return {"detail": "User followed"}
+
+
+@router.delete("/user/{user_id}/follow", status_code=status.HTTP_204_NO_CONTENT)
+async def unfollow_user(
+    user_id: int, current_user: Annotated[User, Depends(get_current_user)]
+):
+    if not await is_following(current_user.id, user_id):
+        raise HTTPException(status_code=404, detail="You don't follow this user")
+
+    logger.info(f"User {current_user.id} unfollows user {user_id}")
+    await unfollow(current_user.id, user_id)
+
+
+@router.get(
+    "/timeline",
+    response_model=list[UserPostWithLikes],
+    response_model_exclude_unset=True,
+)
+async def get_timeline(
+    current_user: Annotated[User, Depends(get_current_user)],
+    before: Optional[int] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+):  # http://localhost:8000/timeline?before=42
+    post_ids = await get_timeline_post_ids(current_user.id, limit, before)
+    if not post_ids:
+        return []
+
+    query = select_post_and_likes.where(post_table.c.id.in_(post_ids)).order_by(
+        post_table.c.id.desc()
+    )
+    logger.debug(f"Executing query: {query}")
+
+    posts = merge_pending_likes(await database.fetch_all(query))
+    return await add_liked_by_me(posts, current_user)
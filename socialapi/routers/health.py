@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Response, status
+
+from socialapi import ratelimit
+from socialapi.background import background_work
+from socialapi.config import config
+from socialapi.database import database
+from socialapi.libs.b2 import get_b2_api
+from socialapi.like_buffer import like_buffer
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+# Connection pool usage, for backends that pool (asyncpg). The SQLite backend
+# opens a connection per query and has nothing to report.
+def pool_stats() -> Optional[dict]:
+    pool = getattr(database._backend, "_pool", None)
+    if pool is None or not hasattr(pool, "get_size"):
+        return None
+
+    size = pool.get_size()
+    in_use = size - pool.get_idle_size()
+    return {
+        "size": size,
+        "in_use": in_use,
+        "max_size": pool.get_max_size(),
+        "utilization": in_use / pool.get_max_size(),
+    }
+
+
+async def check_database() -> dict:
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(
+            database.fetch_val("SELECT 1"), config.HEALTH_DB_TIMEOUT_SECONDS
+        )
+    except Exception as e:
+        logger.warning(f"Readiness database check failed: {e!r}")
+        return {"ok": False, "error": type(e).__name__}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+
+# Liveness: the process serves requests, no dependencies checked
+@router.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+# Readiness: a 503 tells the load balancer to send traffic elsewhere
+@router.get("/readyz")
+async def readyz(response: Response):
+    db = await check_database()
+    pool = pool_stats()
+    checks = {
+        "database": db,
+        "pool": pool,
+        "background": {
+            "pending": background_work.pending,
+            "draining": background_work.draining,
+        },
+        "like_buffer": {"pending": len(like_buffer)},
+        # Allowed/rejected counts per limiter since the worker started
+        "rate_limits": dict(ratelimit.metrics),
+        # Never called from here, B2 is only contacted by uploads
+        "b2": {
+            "configured": bool(config.B2_KEY_ID and config.B2_BUCKET_NAME),
+            "connected": get_b2_api.cache_info().currsize > 0,
+        },
+    }
+
+    reasons = []
+    if not db["ok"]:
+        reasons.append("database unavailable")
+    if pool and pool["utilization"] >= config.READINESS_MAX_POOL_UTILIZATION:
+        reasons.append("connection pool saturated")
+    if background_work.pending >= config.READINESS_MAX_BACKGROUND_TASKS:
+        reasons.append("background queue full")
+    if background_work.draining:
+        reasons.append("shutting down")
+
+    if reasons:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "unavailable", "reasons": reasons, "checks": checks}
+    return {"status": "ready", "checks": checks}
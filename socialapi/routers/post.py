@@ -1,15 +1,35 @@
 import logging
 from enum import Enum
-from typing import Annotated
+from typing import Annotated, Optional
 
 import sqlalchemy
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 
-from socialapi.database import comment_table, database, like_table, post_table
+from socialapi.background import background_work
+from socialapi.config import config
+from socialapi.database import (
+    comment_table,
+    database,
+    like_table,
+    post_score_table,
+    post_table,
+)
+from socialapi.like_buffer import like_buffer
 from socialapi.models.post import (
+    BatchItemResult,
     Comment,
+    CommentBatchIn,
     CommentIn,
     PostLike,
+    PostLikeBatchIn,
     PostLikeIn,
     UserPost,
     UserPostIn,
@@ -17,8 +37,14 @@ from socialapi.models.post import (
     UserPostWithLikes,
 )
 from socialapi.models.user import User
-from socialapi.security import get_current_user
+from socialapi.search import document, index_documents
+from socialapi.security import (
+    get_current_user,
+    get_optional_current_user,
+    get_user_by_id,
+)
 from socialapi.task import generate_and_add_to_post
+from socialapi.timeline import fan_out_post
 
 router = APIRouter()
 
@@ -37,6 +63,44 @@ select_post_and_likes = (
 )
 
 
+# Like counts of a page of posts only, an ix_likes_post_id range per post
+async def count_likes(post_ids: list[int]) -> dict[int, int]:
+    query = (
+        sqlalchemy.select(
+            like_table.c.post_id, sqlalchemy.func.count(like_table.c.id).label("likes")
+        )
+        .where(like_table.c.post_id.in_(post_ids))
+        .group_by(like_table.c.post_id)
+    )
+    return {row.post_id: row.likes for row in await database.fetch_all(query)}
+
+
+# Popular posts ordered by the precomputed time-decayed score (see socialapi.ranking).
+# The page is read off the post_score.score index first, and likes are only
+# counted for the posts on it rather than grouped over the whole likes table.
+async def find_popular_posts(limit: int) -> list:
+    query = (
+        sqlalchemy.select(post_table)
+        .select_from(post_score_table.join(post_table))
+        .order_by(post_score_table.c.score.desc(), post_table.c.id.desc())
+        .limit(limit)
+    )
+    posts = list(await database.fetch_all(query))
+    if len(posts) < limit:
+        # Posts nobody liked yet come last, newest first
+        query = (
+            sqlalchemy.select(post_table)
+            .select_from(post_table.outerjoin(post_score_table))
+            .where(post_score_table.c.post_id.is_(None))
+            .order_by(post_table.c.id.desc())
+            .limit(limit - len(posts))
+        )
+        posts += await database.fetch_all(query)
+
+    likes = await count_likes([post["id"] for post in posts])
+    return [{**post, "likes": likes.get(post["id"], 0)} for post in posts]
+
+
 async def find_post(post_id: int):
     query = post_table.select().where(post_table.c.id == post_id)
     # Log the query
@@ -46,14 +110,71 @@ async def find_post(post_id: int):
     return await database.fetch_one(query)
 
 
+# Add likes still waiting in the write-behind buffer to the stored like counts
+def merge_pending_likes(posts) -> list:
+    pending = like_buffer.pending_counts()
+    if not pending:
+        return posts
+    return [{**post, "likes": post["likes"] + pending[post["id"]]} for post in posts]
+
+
+# Posts of the page liked by the user, a single IN query on (user_id, post_id)
+async def find_liked_post_ids(user_id: int, post_ids: list[int]) -> set[int]:
+    query = (
+        sqlalchemy.select(like_table.c.post_id)
+        .where(like_table.c.user_id == user_id, like_table.c.post_id.in_(post_ids))
+        .distinct()
+    )
+    logger.debug(f"Executing query: {query}")
+    liked = {row.post_id for row in await database.fetch_all(query)}
+    return liked | {
+        post_id for post_id in post_ids if like_buffer.is_pending(post_id, user_id)
+    }
+
+
+# Add liked_by_me to a page of posts when the request has a user
+async def add_liked_by_me(posts, current_user) -> list:
+    if current_user is None or not posts:
+        return posts
+    liked = await find_liked_post_ids(current_user.id, [post["id"] for post in posts])
+    return [{**post, "liked_by_me": post["id"] in liked} for post in posts]
+
+
+# Validate many post ids with a single IN query instead of one find_post per item
+async def find_existing_post_ids(post_ids: set[int]) -> set[int]:
+    query = sqlalchemy.select(post_table.c.id).where(post_table.c.id.in_(post_ids))
+    logger.debug(f"Finding {len(post_ids)} posts in a single query")
+    rows = await database.fetch_all(query)
+    return {row.id for row in rows}
+
+
+# Split a batch into rows to insert and per-item results (201 or 404)
+def prepare_batch(
+    items: list[PostLikeIn] | list[CommentIn], existing_post_ids: set[int], user_id: int
+) -> tuple[list[dict], list[dict]]:
+    results = []
+    rows = []
+    for index, item in enumerate(items):
+        result = {"index": index, "post_id": item.post_id}
+        if item.post_id in existing_post_ids:
+            rows.append({**item.model_dump(), "user_id": user_id})
+            results.append({**result, "status_code": 201})
+        else:
+            results.append({**result, "status_code": 404, "detail": "Post not found"})
+    return results, rows
+
+
 @router.post("/post", response_model=UserPost, status_code=201)
 async def create_post(
     post: UserPostIn,
     current_user: Annotated[User, Depends(get_current_user)],
-    background_tasks: BackgroundTasks,
     request: Request,
     prompt: str = None,
 ):
+    if prompt:
+        # Refuse before saving the post rather than lose its image
+        background_work.ensure_accepting()
+
     data = {
         **post.model_dump(),
         "user_id": current_user.id,
@@ -63,14 +184,20 @@ async def create_post(
     # Log the query
     logger.debug(f"Executing query: {query}")
 
-    last_record_id = await database.execute(query)  # ID generated by the database
+    # The post, its search index entry and timeline entries are written together
+    async with database.transaction():
+        last_record_id = await database.execute(query)  # ID generated by the database
+        await index_documents(
+            [document("post", last_record_id, last_record_id, post.body)]
+        )
+        await fan_out_post(last_record_id, current_user)
 
     if prompt:
         # Log the background task addition
         logger.info(
             f"Adding background task for post ID {last_record_id} with prompt: {prompt}"
         )
-        background_tasks.add_task(
+        background_work.add(
             generate_and_add_to_post,
             current_user.email,
             last_record_id,
@@ -92,10 +219,20 @@ class PostSorting(str, Enum):
     popular = "popular"
 
 
-@router.get("/post", response_model=list[UserPostWithLikes])  # List of posts with likes
+# exclude_unset leaves liked_by_me out of anonymous responses
+@router.get(
+    "/post", response_model=list[UserPostWithLikes], response_model_exclude_unset=True
+)  # List of posts with likes
 async def get_all_posts(
+    current_user: Annotated[User | None, Depends(get_optional_current_user)],
     sorting: PostSorting = PostSorting.recent,
-):  # http://localhost:8000/post?sorting=popular
+    limit: int = Query(
+        default=20,
+        ge=1,
+        le=100,
+        description="Posts returned for every sorting, 20 unless set (at most 100)",
+    ),
+):  # http://localhost:8000/post?sorting=popular&limit=50
     # if sorting == PostSorting.recent:
     #     query = select_post_and_likes.order_by(post_table.c.id.desc())
     # elif sorting == PostSorting.oldest:
@@ -106,16 +243,47 @@ async def get_all_posts(
     # Using the match-case statement (Python 3.10+)
     match sorting:
         case PostSorting.recent:
-            query = select_post_and_likes.order_by(post_table.c.id.desc())
+            query = select_post_and_likes.order_by(post_table.c.id.desc()).limit(limit)
         case PostSorting.oldest:
-            query = select_post_and_likes.order_by(post_table.c.id.asc())
+            query = select_post_and_likes.order_by(post_table.c.id.asc()).limit(limit)
         case PostSorting.popular:
-            query = select_post_and_likes.order_by(sqlalchemy.desc("likes"))
+            posts = merge_pending_likes(await find_popular_posts(limit))
+            return await add_liked_by_me(posts, current_user)
 
     # log the query
     logger.debug(f"Executing query: {query}")
 
-    return await database.fetch_all(query)
+    posts = merge_pending_likes(await database.fetch_all(query))
+    return await add_liked_by_me(posts, current_user)
+
+
+@router.get(
+    "/user/{user_id}/posts",
+    response_model=list[UserPostWithLikes],
+    response_model_exclude_unset=True,
+)
+async def get_user_posts(
+    user_id: int,
+    current_user: Annotated[User | None, Depends(get_optional_current_user)],
+    before: Optional[int] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+):  # http://localhost:8000/user/1/posts?before=42
+    if not await get_user_by_id(user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # Keyset pagination on the (user_id, id) index, newest first
+    query = (
+        select_post_and_likes.where(post_table.c.user_id == user_id)
+        .order_by(post_table.c.id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        query = query.where(post_table.c.id < before)
+
+    logger.debug(f"Executing query: {query}")
+
+    posts = merge_pending_likes(await database.fetch_all(query))
+    return await add_liked_by_me(posts, current_user)
 
 
 # ---- Comments -----
@@ -133,10 +301,41 @@ async def create_comment(
         "user_id": current_user.id,
     }
     query = comment_table.insert().values(data)
-    last_record_id = await database.execute(query)
+    async with database.transaction():
+        last_record_id = await database.execute(query)
+        await index_documents(
+            [document("comment", last_record_id, comment.post_id, comment.body)]
+        )
     return {**data, "id": last_record_id}
 
 
+@router.post("/comment/batch", response_model=list[BatchItemResult])
+async def create_comments_batch(
+    batch: CommentBatchIn, current_user: Annotated[User, Depends(get_current_user)]
+):
+    logger.info(f"Creating {len(batch.comments)} comments in a batch")
+
+    post_ids = {comment.post_id for comment in batch.comments}
+    existing_post_ids = await find_existing_post_ids(post_ids)
+    results, rows = prepare_batch(batch.comments, existing_post_ids, current_user.id)
+
+    # All valid comments are written in one transaction. Comments are inserted one
+    # by one since their ids are needed for the search index.
+    if rows:
+        created = [result for result in results if result["status_code"] == 201]
+        async with database.transaction():
+            for result, row in zip(created, rows):
+                result["id"] = await database.execute(comment_table.insert(), row)
+            await index_documents(
+                [
+                    document("comment", result["id"], row["post_id"], row["body"])
+                    for result, row in zip(created, rows)
+                ]
+            )
+
+    return results
+
+
 @router.get("/post/{post_id}/comments", response_model=list[Comment])
 # pydantic detects the post_id from the path
 async def get_comments_on_post(post_id: int):
@@ -150,8 +349,15 @@ async def get_comments_on_post(post_id: int):
     return await database.fetch_all(query)
 
 
-@router.get("/post/{post_id}", response_model=UserPostWithComments)
-async def get_post_with_comments(post_id: int):
+@router.get(
+    "/post/{post_id}",
+    response_model=UserPostWithComments,
+    response_model_exclude_unset=True,
+)
+async def get_post_with_comments(
+    post_id: int,
+    current_user: Annotated[User | None, Depends(get_optional_current_user)],
+):
     # Fetch post with like count
     query = select_post_and_likes.where(post_table.c.id == post_id)
 
@@ -163,8 +369,9 @@ async def get_post_with_comments(post_id: int):
         raise HTTPException(status_code=404, detail="Post not found")
 
     # The output must match the UserPostWithComments model (post, comments, and likes)
+    posts = await add_liked_by_me(merge_pending_likes([post]), current_user)
     return {
-        "post": post,
+        "post": posts[0],
         "comments": await get_comments_on_post(post_id),
     }
 
@@ -172,7 +379,9 @@ async def get_post_with_comments(post_id: int):
 # ---- Likes endpoints -----
 @router.post("/like", response_model=PostLike, status_code=201)
 async def like_post(
-    like: PostLikeIn, current_user: Annotated[User, Depends(get_current_user)]
+    like: PostLikeIn,
+    current_user: Annotated[User, Depends(get_current_user)],
+    response: Response,
 ):
     logger.info("Liking a post")
 
@@ -182,6 +391,13 @@ async def like_post(
         raise HTTPException(status_code=404, detail="Post not found")
 
     data = {**like.model_dump(), "user_id": current_user.id}
+
+    if config.LIKE_BUFFER_ENABLED:
+        # Accepted now, written by the next buffer flush
+        await like_buffer.add(like.post_id, current_user.id)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {**data, "id": None}
+
     query = like_table.insert().values(data)
 
     # Log the query
@@ -189,3 +405,45 @@ async def like_post(
     # Execute the query
     last_record_id = await database.execute(query)
     return {**data, "id": last_record_id}
+
+
+@router.post("/like/batch", response_model=list[BatchItemResult])
+async def like_posts_batch(
+    batch: PostLikeBatchIn, current_user: Annotated[User, Depends(get_current_user)]
+):
+    logger.info(f"Liking {len(batch.likes)} posts in a batch")
+
+    post_ids = {like.post_id for like in batch.likes}
+    existing_post_ids = await find_existing_post_ids(post_ids)
+    results, rows = prepare_batch(batch.likes, existing_post_ids, current_user.id)
+
+    # All valid likes are written in one transaction
+    if rows:
+        async with database.transaction():
+            await database.execute_many(like_table.insert(), rows)
+
+    return results
+
+
+@router.delete("/like", status_code=status.HTTP_204_NO_CONTENT)
+async def unlike_post(
+    post_id: int, current_user: Annotated[User, Depends(get_current_user)]
+):
+    logger.info("Unliking a post")
+
+    # The like may still be waiting in the write-behind buffer
+    was_pending = await like_buffer.discard(post_id, current_user.id)
+
+    condition = sqlalchemy.and_(
+        like_table.c.user_id == current_user.id, like_table.c.post_id == post_id
+    )
+    stored = await database.fetch_one(
+        sqlalchemy.select(like_table.c.id).where(condition).limit(1)
+    )
+    if not stored and not was_pending:
+        raise HTTPException(status_code=404, detail="Like not found")
+
+    if stored:
+        query = like_table.delete().where(condition)
+        logger.debug(query)
+        await database.execute(query)
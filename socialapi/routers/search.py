@@ -0,0 +1,40 @@
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from socialapi.models.search import SearchPage
+from socialapi.search import decode_cursor, encode_cursor, search_documents
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("/search", response_model=SearchPage)
+async def search(
+    q: str = Query(min_length=1),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+):  # http://localhost:8000/search?q=cat&cursor=...
+    q = q.strip()
+    if not q:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="Search query is empty",
+        )
+
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+    # Fetch one extra row to know whether there is a next page
+    rows = await search_documents(q, limit + 1, after)
+    results = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(results[-1]["rank"], results[-1]["id"])
+
+    return {"results": results, "next_cursor": next_cursor}
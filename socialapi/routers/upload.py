@@ -1,27 +1,125 @@
+import hashlib
 import logging
+import os
 import tempfile
+from typing import Annotated, Optional
 
 import aiofiles
-from fastapi import APIRouter, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
 
+from socialapi.config import config
+from socialapi.database import (
+    database,
+    insert_unless_exists,
+    post_table,
+    upload_table,
+)
 from socialapi.libs.b2 import b2_upload_file
+from socialapi.libs.images import process_image, variant_file_name
+from socialapi.models.user import User
+from socialapi.security import get_optional_current_user
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-# FLOW: client -> server (tempfile) -> B2 -> delete tempfile
+# FLOW: client -> server (tempfile + SHA-256) -> known hash? reuse its URLs
+#       -> image variants (process pool) -> B2 (original + variants)
+#       -> delete tempfiles
 
 
 CHUNK_SIZE = 1024 * 1024  # 1MB
 
+URL_FIELDS = ["file_url", "thumbnail_url", "display_url"]
+
+
+# Only the author may attach an image to a post
+async def find_own_post(post_id: int, current_user: Optional[User]):
+    if current_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    post = await database.fetch_one(
+        post_table.select().where(post_table.c.id == post_id)
+    )
+    if not post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
+        )
+    if post.user_id != current_user.id:  # type: ignore
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Not the author of this post"
+        )
+    return post
+
+
+# Stored URLs of a file with this content, or None if it was never uploaded
+async def find_upload(content_hash: str) -> Optional[dict]:
+    query = upload_table.select().where(upload_table.c.sha256 == content_hash)
+    row = await database.fetch_one(query)
+    if row is None:
+        return None
+    return {name: row[name] for name in URL_FIELDS}
+
+
+async def save_upload(content_hash: str, size: int, urls: dict) -> None:
+    query = upload_table.insert().values(sha256=content_hash, size=size, **urls)
+    # The same file may have been stored concurrently, either copy will do
+    await insert_unless_exists(query)
+
+
+# Upload the file and, for images, its variants to B2
+async def store_file(path: str, file_name: str) -> dict:
+    # Decoding and resizing is CPU bound, it runs in a process pool.
+    # Not an image (or unreadable): only the original is uploaded.
+    variants = await process_image(path)
+    try:
+        # The B2 client blocks, so it runs in a thread
+        urls = {
+            "file_url": await run_in_threadpool(
+                b2_upload_file, local_file=path, file_name=file_name
+            )
+        }
+        for variant, variant_path in variants.items():
+            urls[f"{variant}_url"] = await run_in_threadpool(
+                b2_upload_file,
+                local_file=variant_path,
+                file_name=variant_file_name(file_name, variant),
+            )
+    finally:
+        for variant_path in variants.values():
+            os.remove(variant_path)
+    return urls
+
 
 # Endpoint to handle file uploads
 # The file type UploadFile is a pipe that allows streaming large files
 @router.post("/upload", status_code=status.HTTP_201_CREATED)
-async def upload_file(file: UploadFile):
-    """Endpoint to upload a file to Backblaze B2."""
+async def upload_file(
+    file: UploadFile,
+    current_user: Annotated[Optional[User], Depends(get_optional_current_user)],
+    post_id: Optional[int] = None,
+):
+    """Endpoint to upload a file to Backblaze B2.
+
+    Images are also re-encoded into a thumbnail and a display-sized variant.
+    A file already stored (same SHA-256) is not uploaded again.
+    With post_id, the variant URLs are recorded on the caller's post.
+    """
+    # Size, concurrency and content types are enforced by UploadLimitMiddleware
+    # while the body streams in, this only catches what it couldn't parse
+    if file.content_type not in config.UPLOAD_ALLOWED_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported file type {file.content_type}",
+        )
+    if post_id is not None:
+        await find_own_post(post_id, current_user)
+
     try:
         # tempfile.NamedTemporaryFile is used to create a temporary file, itself is an empty container
         with tempfile.NamedTemporaryFile() as temp_file:
@@ -30,12 +128,22 @@ async def upload_file(file: UploadFile):
             logger.debug(f"Saving uploaded file temporarily to {filename}")
 
             # Write (write binary) in the temporary file and read from the UploadFile stream
+            # The content hash is computed on the way, to find files stored before
+            digest = hashlib.sha256()
+            size = 0
             async with aiofiles.open(filename, "wb") as f:  # "wb" means write binary
                 while chunk := await file.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
                     await f.write(chunk)
 
-            # After writing the file to a temporary location, upload it to B2
-            file_url = b2_upload_file(local_file=filename, file_name=file.filename)
+            content_hash = digest.hexdigest()
+            urls = await find_upload(content_hash)
+            if urls is None:
+                urls = await store_file(filename, file.filename)
+                await save_upload(content_hash, size, urls)
+            else:
+                logger.debug(f"Upload {content_hash} already stored, skipping B2")
 
     except Exception:
         raise HTTPException(
@@ -43,4 +151,18 @@ async def upload_file(file: UploadFile):
             detail="There was an error uploading the file.",
         )
 
-    return {"detail": f"Successfully uploaded {file.filename}", "file_url": file_url}
+    if post_id is not None:
+        query = (
+            post_table.update()
+            .where(post_table.c.id == post_id)
+            .values(
+                image_url=urls.get("display_url") or urls["file_url"],
+                thumbnail_url=urls.get("thumbnail_url"),
+            )
+        )
+        await database.execute(query)
+
+    return {
+        "detail": f"Successfully uploaded {file.filename}",
+        **{name: url for name, url in urls.items() if url},
+    }
@@ -0,0 +1,206 @@
+import datetime
+import logging
+import uuid
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+
+from socialapi.config import config
+from socialapi.database import database, upload_part_table, upload_session_table
+from socialapi.libs.b2 import (
+    b2_finish_large_file,
+    b2_start_large_file,
+    b2_upload_part,
+)
+from socialapi.models.upload import UploadSession, UploadSessionIn
+from socialapi.models.user import User
+from socialapi.security import get_current_user
+from socialapi.upload_sessions import expected_part_size, get_parts, part_count
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def upload_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail="There was an error uploading the file.",
+    )
+
+
+async def find_session(session_id: str, current_user: User):
+    query = upload_session_table.select().where(
+        upload_session_table.c.id == session_id,
+        upload_session_table.c.user_id == current_user.id,
+    )
+    session = await database.fetch_one(query)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found"
+        )
+    return session
+
+
+async def session_response(session) -> dict:
+    parts = await get_parts(session.id)
+    return {
+        **session,
+        "part_count": part_count(session.size, session.chunk_size),
+        "parts_received": [part.part_number for part in parts],
+    }
+
+
+@router.post(
+    "/upload/sessions",
+    response_model=UploadSession,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_upload_session(
+    body: UploadSessionIn, current_user: Annotated[User, Depends(get_current_user)]
+):
+    if body.content_type not in config.UPLOAD_ALLOWED_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported file type {body.content_type}",
+        )
+    if body.size > config.UPLOAD_RESUMABLE_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"Upload is larger than {config.UPLOAD_RESUMABLE_MAX_BYTES} bytes",
+        )
+    # A B2 large file needs at least two parts
+    if body.size <= config.UPLOAD_CHUNK_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Files up to {config.UPLOAD_CHUNK_BYTES} bytes go to POST /upload",
+        )
+
+    try:
+        b2_file_id = await run_in_threadpool(
+            b2_start_large_file, body.file_name, body.content_type
+        )
+    except Exception:
+        raise upload_error()
+
+    data = {
+        **body.model_dump(),
+        "id": uuid.uuid4().hex,
+        "user_id": current_user.id,
+        "chunk_size": config.UPLOAD_CHUNK_BYTES,
+        "b2_file_id": b2_file_id,
+        "created_at": datetime.datetime.now(datetime.UTC),
+    }
+    await database.execute(upload_session_table.insert().values(data))
+    logger.info(f"Started upload session {data['id']} for {body.file_name}")
+    return {
+        **data,
+        "part_count": part_count(body.size, config.UPLOAD_CHUNK_BYTES),
+        "parts_received": [],
+    }
+
+
+# Clients call this after reconnecting to find out which chunks to resend
+@router.get("/upload/sessions/{session_id}", response_model=UploadSession)
+async def get_upload_session(
+    session_id: str, current_user: Annotated[User, Depends(get_current_user)]
+):
+    return await session_response(await find_session(session_id, current_user))
+
+
+# Sending a chunk again replaces it, so a retry after a lost response is safe
+@router.put("/upload/sessions/{session_id}/chunks/{part_number}")
+async def upload_chunk(
+    session_id: str,
+    part_number: int,
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    session = await find_session(session_id, current_user)
+    if session.file_url is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Upload already completed"
+        )
+    if not 1 <= part_number <= part_count(session.size, session.chunk_size):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Chunk number out of range"
+        )
+
+    # At most one chunk is held in memory, stop reading once it is too long
+    expected = expected_part_size(session, part_number)
+    data = bytearray()
+    async for body in request.stream():
+        data += body
+        if len(data) > expected:
+            break
+    if len(data) != expected:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chunk {part_number} must be {expected} bytes",
+        )
+
+    try:
+        sha1 = await run_in_threadpool(
+            b2_upload_part, session.b2_file_id, part_number, bytes(data)
+        )
+    except Exception:
+        raise upload_error()
+
+    async with database.transaction():
+        await database.execute(
+            upload_part_table.delete().where(
+                upload_part_table.c.session_id == session_id,
+                upload_part_table.c.part_number == part_number,
+            )
+        )
+        await database.execute(
+            upload_part_table.insert().values(
+                session_id=session_id,
+                part_number=part_number,
+                size=len(data),
+                sha1=sha1,
+            )
+        )
+    return {"part_number": part_number, "size": len(data)}
+
+
+@router.post("/upload/sessions/{session_id}/complete")
+async def complete_upload_session(
+    session_id: str, current_user: Annotated[User, Depends(get_current_user)]
+):
+    session = await find_session(session_id, current_user)
+    if session.file_url is None:
+        parts = await get_parts(session_id)
+        received = {part.part_number for part in parts}
+        missing = [
+            number
+            for number in range(1, part_count(session.size, session.chunk_size) + 1)
+            if number not in received
+        ]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Missing chunks: {', '.join(map(str, missing))}",
+            )
+
+        try:
+            file_url = await run_in_threadpool(
+                b2_finish_large_file,
+                session.b2_file_id,
+                [part.sha1 for part in parts],
+            )
+        except Exception:
+            raise upload_error()
+
+        query = (
+            upload_session_table.update()
+            .where(upload_session_table.c.id == session_id)
+            .values(file_url=file_url)
+        )
+        await database.execute(query)
+        session = {**session, "file_url": file_url}
+
+    return {
+        "detail": f"Successfully uploaded {session['file_name']}",
+        "file_url": session["file_url"],
+    }
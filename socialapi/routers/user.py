@@ -1,20 +1,28 @@
 import logging
 from typing import Annotated
 
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, status
+from fastapi import APIRouter, HTTPException, Request, status
 from fastapi.params import Depends
 from fastapi.security import OAuth2PasswordRequestForm
 
 from socialapi import task
+from socialapi.background import background_work
 from socialapi.database import database, user_table
-from socialapi.models.user import UserIn
+from socialapi.models.user import EmailIn, RefreshTokenIn, UserIn
+from socialapi.ratelimit import check_login_rate_limit
 from socialapi.security import (
     authenticate_user,
     create_access_token,
     create_confirmation_token,
+    create_credentials_exception,
+    create_refresh_token,
     get_hash_password,
+    get_payload_for_token_type,
     get_subject_for_token_type,
     get_user,
+    oauth2_scheme,
+    revocation_list,
+    run_in_hashing_pool,
 )
 
 router = APIRouter()
@@ -22,7 +30,9 @@ logger = logging.getLogger(__name__)
 
 
 @router.post("/register", status_code=201)
-async def register(user: UserIn, background_tasks: BackgroundTasks, request: Request):
+async def register(user: UserIn, request: Request):
+    # The confirmation email can't be sent once shutdown started
+    background_work.ensure_accepting()
     if await get_user(user.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -30,30 +40,92 @@ async def register(user: UserIn, background_tasks: BackgroundTasks, request: Req
         )
 
     # Essential to hash the password before storing it
-    hashed_password = get_hash_password(user.password)
+    hashed_password = await run_in_hashing_pool(get_hash_password, user.password)
     query = user_table.insert().values(email=user.email, password=hashed_password)
 
     # Log the registration attempt
     logger.debug(query)
 
     await database.execute(query)
+    await send_confirmation_email(user.email, request)
+    return {"detail": "User created. Please confirm your email."}
+
+
+# Schedule the confirmation email unless one was sent within the cooldown
+async def send_confirmation_email(email: str, request: Request) -> None:
+    if not await task.claim_email_send(email, "confirmation", database):
+        return
+
     # Send Confirmation Email
-    background_tasks.add_task(
+    background_work.add(
         task.send_user_registration_email,
-        user.email,
+        email,
         confirmation_url=request.url_for(
-            "confirm_email", token=create_confirmation_token(user.email)
+            "confirm_email", token=create_confirmation_token(email)
         ),  # type: ignore
     )
-    return {"detail": "User created. Please confirm your email."}
+
+
+@router.post("/resend-confirmation", status_code=status.HTTP_202_ACCEPTED)
+async def resend_confirmation(body: EmailIn, request: Request):
+    background_work.ensure_accepting()
+    user = await get_user(body.email)
+    if user and not user.confirmed:  # type: ignore
+        await send_confirmation_email(body.email, request)
+
+    # Same answer whether or not the account exists
+    return {
+        "detail": "If the account exists and is not confirmed, "
+        "a confirmation email has been sent."
+    }
 
 
 @router.post("/token")
 # form_data will have username and password attributes
-async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
+async def login(
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], request: Request
+):
+    # Reject floods before spending a bcrypt verification on them
+    ip = request.client.host if request.client else None
+    await check_login_rate_limit(ip, form_data.username)
     user = await authenticate_user(form_data.username, form_data.password)  # type: ignore
     access_token = create_access_token(email=user.email)  # type: ignore
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = create_refresh_token(email=user.email)  # type: ignore
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
+
+
+@router.post("/token/refresh")
+async def refresh_access_token(body: RefreshTokenIn):
+    """Exchange a refresh token for new tokens without checking the password again"""
+    payload = get_payload_for_token_type(body.refresh_token, "refresh")
+    if not await get_user(payload["sub"]):
+        raise create_credentials_exception("User not found")
+
+    # Refresh tokens are single use, the old one is revoked on rotation.
+    # Of two requests racing with the same token only one gets new tokens.
+    if not await revocation_list.revoke(payload):
+        raise create_credentials_exception("Token has been revoked")
+    return {
+        "access_token": create_access_token(email=payload["sub"]),
+        "refresh_token": create_refresh_token(email=payload["sub"]),
+        "token_type": "bearer",
+    }
+
+
+@router.post("/logout")
+async def logout(
+    token: Annotated[str, Depends(oauth2_scheme)], body: RefreshTokenIn | None = None
+):
+    await revocation_list.revoke(get_payload_for_token_type(token, "access"))
+    if body:
+        await revocation_list.revoke(
+            get_payload_for_token_type(body.refresh_token, "refresh")
+        )
+    return {"detail": "Logged out"}
 
 
 @router.get("/confirm/{token}")
@@ -0,0 +1,83 @@
+import logging
+from typing import Literal
+
+from socialapi.database import database
+
+logger = logging.getLogger(__name__)
+
+# --- Full-text search ---
+# Post and comment bodies are copied into search_index when they are created
+# (see SEARCH_INDEX_DDL in socialapi/migrations/m0001_baseline.py). Results are
+# ordered by (rank, id), lower is better, and paginated with a keyset cursor on
+# that pair.
+
+SQLITE_SEARCH = """
+SELECT rowid AS id, kind, ref_id, post_id, body, rank
+FROM search_index
+WHERE search_index MATCH :query {after}
+ORDER BY rank, rowid
+LIMIT :limit
+"""
+SQLITE_AFTER = "AND (rank > :rank OR (rank = :rank AND rowid > :id))"
+
+# ts_rank is higher for better matches, negate it to sort like SQLite's bm25
+POSTGRES_SEARCH = """
+SELECT * FROM (
+    SELECT id, kind, ref_id, post_id, body, -ts_rank(tsv, query) AS rank
+    FROM search_index, plainto_tsquery('english', :query) AS query
+    WHERE tsv @@ query
+) AS matches
+WHERE TRUE {after}
+ORDER BY rank, id
+LIMIT :limit
+"""
+POSTGRES_AFTER = "AND (rank, id) > (:rank, :id)"
+
+INSERT_DOCUMENT = (
+    "INSERT INTO search_index (body, kind, ref_id, post_id) "
+    "VALUES (:body, :kind, :ref_id, :post_id)"
+)
+
+
+def is_sqlite() -> bool:
+    return database.url.dialect == "sqlite"
+
+
+# Quote every term so user input can't use (or break) FTS5 query syntax
+def to_fts5_query(text: str) -> str:
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+def document(kind: Literal["post", "comment"], ref_id: int, post_id: int, body: str):
+    return {"kind": kind, "ref_id": ref_id, "post_id": post_id, "body": body}
+
+
+async def index_documents(documents: list[dict]) -> None:
+    logger.debug(f"Indexing {len(documents)} documents for search")
+    await database.execute_many(INSERT_DOCUMENT, documents)
+
+
+def encode_cursor(rank: float, id: int) -> str:
+    return f"{rank!r}:{id}"
+
+
+def decode_cursor(cursor: str) -> tuple[float, int]:
+    rank, id = cursor.split(":")
+    return float(rank), int(id)
+
+
+async def search_documents(
+    text: str, limit: int, after: tuple[float, int] | None = None
+) -> list:
+    if is_sqlite():
+        sql, after_sql, text = SQLITE_SEARCH, SQLITE_AFTER, to_fts5_query(text)
+    else:
+        sql, after_sql = POSTGRES_SEARCH, POSTGRES_AFTER
+
+    values = {"query": text, "limit": limit}
+    if after:
+        values.update(rank=after[0], id=after[1])
+
+    query = sql.format(after=after_sql if after else "")
+    logger.debug(f"Executing query: {query}")
+    return await database.fetch_all(query, values)
@@ -1,13 +1,29 @@
+import asyncio
 import datetime
+import hashlib
 import logging
-from typing import Annotated, Literal
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Annotated, Literal, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import ExpiredSignatureError, JWTError, jwt
-from passlib.context import CryptContext
 
-from socialapi.database import database, user_table
+from socialapi.config import config
+from socialapi.database import (
+    database,
+    insert_unless_exists,
+    revoked_token_table,
+    user_table,
+)
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +31,8 @@ logger = logging.getLogger(__name__)
 # This is used in routes to get the token
 # if we do oauth2_scheme() we get the token string
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Same, but returns None instead of failing when no token is sent
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 # --- Access Token (JWT) Management ---
 # Not a good practice to hardcode secret keys in code.
@@ -32,13 +50,34 @@ def confirm_token_expiry_minutes() -> int:
     return 1440  # 1 day
 
 
+# Long-lived token used to get new access tokens without the password
+def refresh_token_expiry_minutes() -> int:
+    return 43200  # 30 days
+
+
 def create_access_token(email: str) -> str:
     logger.debug("Creating access token", extra={"email": email})
     expire = datetime.datetime.now(datetime.UTC) + datetime.timedelta(
         minutes=access_token_expiry_minutes()
     )
-    # Create JWT token
-    jwt_data = {"sub": email, "exp": expire, "type": "access"}
+    # Create JWT token, jti identifies the token in the revocation list
+    jwt_data = {"sub": email, "exp": expire, "type": "access", "jti": uuid.uuid4().hex}
+    encoded_jwt = jwt.encode(jwt_data, key=SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+
+# Create refresh token
+def create_refresh_token(email: str) -> str:
+    logger.debug("Creating refresh token", extra={"email": email})
+    expire = datetime.datetime.now(datetime.UTC) + datetime.timedelta(
+        minutes=refresh_token_expiry_minutes()
+    )
+    jwt_data = {
+        "sub": email,
+        "exp": expire,
+        "type": "refresh",
+        "jti": uuid.uuid4().hex,
+    }
     encoded_jwt = jwt.encode(jwt_data, key=SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -55,10 +94,55 @@ def create_confirmation_token(email: str) -> str:
     return encoded_jwt
 
 
-# Decode token and get subject (email)
-def get_subject_for_token_type(
-    token: str, type: Literal["access", "confirmation"]
-) -> str:
+# --- Verified Token Cache ---
+# Clients send the same token on every request, so the payload of tokens that
+# passed verification is kept (keyed by the token's SHA-256) and later calls skip
+# the signature check and JSON parsing. Entries are never served past "exp".
+class TokenCache:
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, dict] = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict | None:
+        key = self._key(token)
+        payload = self._entries.get(key)
+        if payload is None:
+            return None
+        if payload["exp"] <= time.time():
+            # Let jwt.decode report the expiry
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return payload
+
+    def set(self, token: str, payload: dict) -> None:
+        # Tokens without an expiry are never cached
+        if self.max_size <= 0 or "exp" not in payload:
+            return
+        key = self._key(token)
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        # Evict the least recently used entries
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+token_cache = TokenCache(max_size=config.TOKEN_CACHE_SIZE)
+
+
+# Verify the token signature and expiry, served from the cache when possible
+def decode_token(token: str) -> dict:
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, key=SECRET_KEY, algorithms=[ALGORITHM])
 
@@ -68,6 +152,65 @@ def get_subject_for_token_type(
     except JWTError as e:
         raise create_credentials_exception("Token is invalid") from e
 
+    token_cache.set(token, payload)
+    return payload
+
+
+# --- Token Revocation ---
+# Revoked token ids are stored in the revoked_token table and mirrored in an
+# in-process set, so checking a token never needs a database query. Each worker
+# reloads the set from the table periodically (REVOCATION_SYNC_INTERVAL_SECONDS),
+# other workers see a revocation after at most one interval.
+class RevocationList:
+    def __init__(self) -> None:
+        self._revoked: set[str] = set()
+
+    def is_revoked(self, jti: str | None) -> bool:
+        return jti in self._revoked
+
+    # True only for the call that stored the revocation. The insert is the
+    # atomic check, so a token consumed by another request or worker is
+    # reported even before sync() has seen it.
+    async def revoke(self, payload: dict) -> bool:
+        jti = payload.get("jti")
+        if jti is None or jti in self._revoked:
+            return False
+        logger.debug(f"Revoking {payload['type']} token")
+        inserted = await insert_unless_exists(
+            revoked_token_table.insert().values(
+                jti=jti,
+                expires_at=datetime.datetime.fromtimestamp(
+                    payload["exp"], datetime.UTC
+                ),
+            )
+        )
+        self._revoked.add(jti)
+        return inserted
+
+    async def sync(self) -> None:
+        now = datetime.datetime.now(datetime.UTC)
+        # Revocations made while the queries below await are not in their
+        # rows, they are kept on top of what the table returns
+        known = set(self._revoked)
+        # Expired tokens are rejected anyway, no need to remember them
+        await database.execute(
+            revoked_token_table.delete().where(revoked_token_table.c.expires_at <= now)
+        )
+        rows = await database.fetch_all(
+            revoked_token_table.select().where(revoked_token_table.c.expires_at > now)
+        )
+        self._revoked = {row.jti for row in rows} | (self._revoked - known)
+
+
+revocation_list = RevocationList()
+
+
+# Decode token and check its type, returns the whole payload
+def get_payload_for_token_type(
+    token: str, type: Literal["access", "confirmation", "refresh"]
+) -> dict:
+    payload = decode_token(token)
+
     # Extract email (subject)
     email = payload.get("sub")
     if email is None:
@@ -80,20 +223,98 @@ def get_subject_for_token_type(
             f"Token has incorrect type, expected: '{type}'"
         )
 
-    return email
+    if revocation_list.is_revoked(payload.get("jti")):
+        raise create_credentials_exception("Token has been revoked")
+
+    return payload
+
+
+# Decode token and get subject (email)
+def get_subject_for_token_type(
+    token: str, type: Literal["access", "confirmation", "refresh"]
+) -> str:
+    return get_payload_for_token_type(token, type)["sub"]
 
 
 # --- Password Hashing Context ---
-pwd_context = CryptContext(schemes=["bcrypt"])
+# The first scheme hashes new passwords, the others are still accepted and
+# upgraded on the next successful login. Hashes with a different cost than the
+# configured one are upgraded the same way.
+def build_crypt_context(
+    schemes: list[str],
+    bcrypt_rounds: int,
+    argon2_time_cost: int,
+    argon2_memory_cost: int,
+    argon2_parallelism: int,
+) -> "CryptContext":
+    from passlib.context import CryptContext
+
+    settings = {}
+    if "bcrypt" in schemes:
+        settings.update(
+            bcrypt__default_rounds=bcrypt_rounds,
+            bcrypt__min_rounds=bcrypt_rounds,
+            bcrypt__max_rounds=bcrypt_rounds,
+        )
+    if "argon2" in schemes:
+        # argon2 needs the optional argon2-cffi package
+        settings.update(
+            argon2__time_cost=argon2_time_cost,
+            argon2__memory_cost=argon2_memory_cost,
+            argon2__parallelism=argon2_parallelism,
+        )
+    return CryptContext(schemes=schemes, deprecated="auto", **settings)
+
+
+# Built on first use, passlib and bcrypt are not needed to serve most requests
+pwd_context: Optional["CryptContext"] = None
+
+
+def get_pwd_context() -> "CryptContext":
+    global pwd_context
+    if pwd_context is None:
+        pwd_context = build_crypt_context(
+            config.PASSWORD_SCHEMES,
+            config.BCRYPT_ROUNDS,
+            config.ARGON2_TIME_COST,
+            config.ARGON2_MEMORY_COST,
+            config.ARGON2_PARALLELISM,
+        )
+    return pwd_context
 
 
 def get_hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     # the plain_password must be verified using the same hashing algorithm as used in hash_password
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+# --- Password Hashing Pool ---
+# bcrypt is deliberately slow, so hashing runs in a bounded thread pool (bcrypt
+# releases the GIL) instead of blocking the event loop. The pool size also caps
+# how much CPU logins and registrations can take at once.
+hashing_pool = ThreadPoolExecutor(
+    max_workers=config.PASSWORD_HASHING_WORKERS or os.cpu_count(),
+    thread_name_prefix="password-hashing",
+)
+
+
+async def run_in_hashing_pool(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(hashing_pool, func, *args)
+
+
+# Hash checked for unknown users so they cost the same as real ones
+@lru_cache()
+def get_dummy_hash() -> str:
+    return get_hash_password("dummy password for unknown users")
+
+
+def verify_dummy_password(plain_password: str) -> bool:
+    verify_password(plain_password, get_dummy_hash())
+    return False
 
 
 # --- User Retrieval ---
@@ -106,6 +327,11 @@ async def get_user(email: str):
         return result
 
 
+async def get_user_by_id(user_id: int):
+    query = user_table.select().where(user_table.c.id == user_id)
+    return await database.fetch_one(query)
+
+
 # --- Authentication Functionality ---
 def create_credentials_exception(detail: str) -> HTTPException:
     return HTTPException(
@@ -119,14 +345,35 @@ async def authenticate_user(email: str, password: str):
     logger.debug("Authenticating user", extra={"email": email})
     user = await get_user(email)
     if not user:
+        # Do the same bcrypt work as for a real user: same latency, no hint
+        # that the account doesn't exist
+        await run_in_hashing_pool(verify_dummy_password, password)
         raise create_credentials_exception("Incorrect email or password")
-    if not verify_password(password, user.password):  # type: ignore
+    if not await run_in_hashing_pool(
+        verify_password,
+        password,
+        user.password,  # type: ignore
+    ):
         raise create_credentials_exception("Incorrect email or password")
     if not user.confirmed:  # type: ignore
         raise create_credentials_exception("User has not confirmed email")
+    if get_pwd_context().needs_update(user.password):  # type: ignore
+        await rehash_password(user, password)
     return user
 
 
+# Store the password again with the current scheme and cost
+async def rehash_password(user, password: str) -> None:
+    logger.info("Upgrading password hash", extra={"email": user.email})
+    hashed_password = await run_in_hashing_pool(get_hash_password, password)
+    query = (
+        user_table.update()
+        .where(user_table.c.id == user.id)
+        .values(password=hashed_password)
+    )
+    await database.execute(query)
+
+
 # get current user from token
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     email = get_subject_for_token_type(token, type="access")
@@ -134,3 +381,29 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     if user is None:
         raise create_credentials_exception("User not found")
     return user
+
+
+# Email of the bearer token in raw ASGI headers, for middlewares.
+# None for anonymous requests or invalid tokens.
+def get_token_subject(headers: list[tuple[bytes, bytes]]) -> str | None:
+    authorization = dict(headers).get(b"authorization", b"").decode()
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return get_subject_for_token_type(token, "access")
+    except HTTPException:
+        return None
+
+
+# get current user when a valid token is sent, None otherwise. Public routes
+# only personalise the response, so a stale or revoked token reads anonymously.
+async def get_optional_current_user(
+    token: Annotated[str | None, Depends(oauth2_scheme_optional)],
+):
+    if token is None:
+        return None
+    try:
+        return await get_current_user(token)
+    except HTTPException:
+        return None
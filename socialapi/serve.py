@@ -0,0 +1,75 @@
+# Production entry point:
+#
+#     ENV_STATE=prod python -m socialapi.serve [--workers N] [--host H] [--port P]
+#
+# Runs uvicorn's process manager with SERVER_* settings. On SIGTERM uvicorn
+# stops accepting connections, waits up to SERVER_GRACEFUL_SHUTDOWN_SECONDS
+# for in-flight requests, then runs the lifespan shutdown in each worker,
+# which drains background work and disconnects the database.
+import argparse
+import importlib
+import importlib.util
+import logging
+import os
+from typing import Optional
+
+import uvicorn
+
+from socialapi.config import config
+
+logger = logging.getLogger(__name__)
+
+APP = "socialapi.main:app"
+
+
+def default_workers() -> int:
+    return config.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def server_options(
+    workers: Optional[int] = None,
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+) -> dict:
+    return {
+        "host": host or config.SERVER_HOST,
+        "port": port or config.SERVER_PORT,
+        "workers": workers or default_workers(),
+        "loop": "uvloop" if has_module("uvloop") else "asyncio",
+        "http": "httptools" if has_module("httptools") else "h11",
+        "backlog": config.SERVER_BACKLOG,
+        "timeout_keep_alive": config.SERVER_KEEP_ALIVE_SECONDS,
+        "timeout_graceful_shutdown": config.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        "limit_concurrency": config.SERVER_LIMIT_CONCURRENCY,
+        "proxy_headers": True,
+        "forwarded_allow_ips": config.SERVER_FORWARDED_ALLOW_IPS,
+        "lifespan": "on",
+        # Logging is configured by the app lifespan, see logging_conf.py
+        "log_config": None,
+    }
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m socialapi.serve")
+    parser.add_argument("--workers", type=int, help="defaults to the CPU count")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    args = parser.parse_args(argv)
+
+    options = server_options(args.workers, args.host, args.port)
+    # Workers are spawned and import the app themselves, so it can't be shared.
+    # Importing it once here is safe (no connections or threads on import) and
+    # makes a broken deploy fail once instead of in every worker.
+    app = importlib.import_module(APP.split(":")[0]).app
+    if options["workers"] == 1:
+        uvicorn.run(app, **options)
+    else:
+        uvicorn.run(APP, **options)
+
+
+if __name__ == "__main__":
+    main()
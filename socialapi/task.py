@@ -1,11 +1,12 @@
+import datetime
 import logging
 from json import JSONDecodeError
 
-import httpx
+import sqlalchemy
 from databases import Database
 
 from socialapi.config import config
-from socialapi.database import post_table
+from socialapi.database import email_dispatch_table, is_unique_violation, post_table
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,8 @@ async def send_simple_email(to: str, subject: str, body: str):
     # The [:3] and [:20] slices are to avoid logging sensitive or overly long information
     logger.debug(f"Sending email to '{to[:3]}' with subject '{subject[:20]}'")
 
+    import httpx  # slow to import (pulls in rich), only needed once we send
+
     async with httpx.AsyncClient() as client:
         try:
             # Send the email using Mailgun API
@@ -47,6 +50,45 @@ async def send_simple_email(to: str, subject: str, body: str):
             ) from err
 
 
+# --- Email deduplication ---
+# Retries from flaky clients must not send the same email again: only one email
+# per (email, purpose) is allowed every EMAIL_RESEND_COOLDOWN_SECONDS.
+async def claim_email_send(email: str, purpose: str, database: Database) -> bool:
+    now = datetime.datetime.now(datetime.UTC)
+    cutoff = now - datetime.timedelta(seconds=config.EMAIL_RESEND_COOLDOWN_SECONDS)
+    same_email = sqlalchemy.and_(
+        email_dispatch_table.c.email == email,
+        email_dispatch_table.c.purpose == purpose,
+    )
+
+    try:
+        async with database.transaction():
+            recent = await database.fetch_one(
+                email_dispatch_table.select().where(
+                    same_email, email_dispatch_table.c.sent_at > cutoff
+                )
+            )
+            if recent:
+                logger.debug(
+                    f"Skipping '{purpose}' email sent recently to '{email[:3]}'"
+                )
+                return False
+
+            await database.execute(email_dispatch_table.delete().where(same_email))
+            await database.execute(
+                email_dispatch_table.insert().values(
+                    email=email, purpose=purpose, sent_at=now
+                )
+            )
+    except Exception as e:
+        # A concurrent request claimed it first
+        if not is_unique_violation(e):
+            raise
+        return False
+
+    return True
+
+
 # Send confirmation email
 async def send_user_registration_email(email: str, confirmation_url: str):
     """ "Send user registration confirmation email"""
@@ -67,6 +109,8 @@ async def send_user_registration_email(email: str, confirmation_url: str):
 async def _generate_cute_creature_api(prompt: str):
     logger.debug("Generating cute creature image with DeepAI API")
 
+    import httpx  # lazy, see send_simple_email
+
     async with httpx.AsyncClient() as client:
         try:
             response = await client.post(
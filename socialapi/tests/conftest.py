@@ -11,8 +11,11 @@ from httpx import ASGITransport, AsyncClient, Request, Response
 from socialapi.tests.helper import create_post
 
 os.environ["ENV_STATE"] = "test"
+from socialapi import ratelimit  # noqa: E402
+from socialapi.background import background_work  # noqa: E402
 from socialapi.database import database, user_table
 from socialapi.main import app  # noqa: E402
+from socialapi.migrate import upgrade  # noqa: E402
 
 
 # Configure pytest to use asyncio for async tests
@@ -21,6 +24,12 @@ def anyio_backend():
     return "asyncio"
 
 
+# Bring the test database schema up to date once per session
+@pytest.fixture(scope="session", autouse=True)
+def migrate_database():
+    upgrade()
+
+
 # Create a TestClient instance for synchronous tests
 @pytest.fixture()
 def client() -> Generator:
@@ -33,10 +42,18 @@ async def db() -> AsyncGenerator:
     # Setup: Clear the in-memory tables before each test
     await database.connect()
     yield database
+    # Let emails and image generation scheduled by the test finish first
+    await background_work.wait(timeout=5)
     # Teardown: Clear the in-memory tables after each test
     await database.disconnect()
 
 
+# Start every test with empty rate limit buckets
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    ratelimit.rate_limit_store.clear()
+
+
 # Create an AsyncClient instance for asynchronous tests
 @pytest.fixture()
 # Dependency Injection:
@@ -101,7 +118,8 @@ async def logged_in_token(async_client: AsyncClient, confirmed_user: dict) -> st
 @pytest.fixture(autouse=True)
 def mock_httpx_client(mocker):
     # Mock the AsyncClient used in socialapi.task to prevent real HTTP requests during tests
-    mocked_client = mocker.patch("socialapi.task.httpx.AsyncClient")
+    # (socialapi.task imports httpx lazily, so patch it on the httpx module)
+    mocked_client = mocker.patch("httpx.AsyncClient")
 
     # Create a mock instance of AsyncClient
     mocked_async_client = Mock()
@@ -0,0 +1,103 @@
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from socialapi.database import database, user_table
+from socialapi.tests.helper import create_post
+
+
+# A second confirmed user who writes the posts the first user follows
+@pytest.fixture()
+async def author_token(async_client: AsyncClient) -> str:
+    user_details = {"email": "author@example.com", "password": "NotSecure123!"}
+    await async_client.post("/register", json=user_details)
+    await database.execute(
+        user_table.update()
+        .where(user_table.c.email == user_details["email"])
+        .values(confirmed=True)
+    )
+    response = await async_client.post(
+        "/token",
+        data={"username": user_details["email"], "password": user_details["password"]},
+    )
+    return response.json()["access_token"]
+
+
+async def follow_user(async_client: AsyncClient, user_id: int, token: str):
+    return await async_client.post(
+        f"/user/{user_id}/follow", headers={"Authorization": f"Bearer {token}"}
+    )
+
+
+async def get_timeline(async_client: AsyncClient, token: str, **params) -> list:
+    response = await async_client.get(
+        "/timeline", params=params, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return [post["id"] for post in response.json()]
+
+
+@pytest.mark.anyio
+async def test_follow_user(
+    async_client: AsyncClient, logged_in_token: str, author_token: str
+):
+    response = await follow_user(async_client, 2, logged_in_token)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    # Following twice is rejected
+    response = await follow_user(async_client, 2, logged_in_token)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.anyio
+async def test_follow_missing_user(async_client: AsyncClient, logged_in_token: str):
+    response = await follow_user(async_client, 999, logged_in_token)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.anyio
+async def test_follow_yourself(
+    async_client: AsyncClient, confirmed_user: dict, logged_in_token: str
+):
+    response = await follow_user(async_client, confirmed_user["id"], logged_in_token)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# Posts are fanned out to followers and backfilled on follow
+@pytest.mark.anyio
+async def test_timeline_fan_out(
+    async_client: AsyncClient, logged_in_token: str, author_token: str
+):
+    await create_post("Before follow", async_client, author_token)
+    await follow_user(async_client, 2, logged_in_token)
+    await create_post("After follow", async_client, author_token)
+    await create_post("My own post", async_client, logged_in_token)
+
+    assert await get_timeline(async_client, logged_in_token) == [3, 2, 1]
+    assert await get_timeline(async_client, logged_in_token, before=3, limit=1) == [2]
+
+
+# Authors above the fan-out limit are merged in on read
+@pytest.mark.anyio
+async def test_timeline_fan_out_on_read(
+    async_client: AsyncClient, logged_in_token: str, author_token: str, mocker
+):
+    mocker.patch("socialapi.timeline.config.TIMELINE_FANOUT_MAX_FOLLOWERS", 0)
+    await follow_user(async_client, 2, logged_in_token)
+    await create_post("Celebrity post", async_client, author_token)
+
+    assert await get_timeline(async_client, logged_in_token) == [1]
+
+
+@pytest.mark.anyio
+async def test_unfollow_user(
+    async_client: AsyncClient, logged_in_token: str, author_token: str
+):
+    await follow_user(async_client, 2, logged_in_token)
+    await create_post("Author post", async_client, author_token)
+
+    response = await async_client.delete(
+        "/user/2/follow", headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert await get_timeline(async_client, logged_in_token) == []
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+
+@pytest.mark.anyio
+async def test_healthz(async_client: AsyncClient):
+    response = await async_client.get("/healthz")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"status": "ok"}
+
+
+@pytest.mark.anyio
+async def test_readyz(async_client: AsyncClient):
+    response = await async_client.get("/readyz")
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["status"] == "ready"
+    assert body["checks"]["database"]["ok"]
+    assert body["checks"]["background"] == {"pending": 0, "draining": False}
+    assert "rate_limits" in body["checks"]
+
+
+# A database that doesn't answer within the timeout makes the worker unready
+@pytest.mark.anyio
+async def test_readyz_database_timeout(async_client: AsyncClient, mocker):
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(1)
+
+    mocker.patch("socialapi.routers.health.config.HEALTH_DB_TIMEOUT_SECONDS", 0.01)
+    mocker.patch("socialapi.routers.health.database.fetch_val", side_effect=hang)
+
+    response = await async_client.get("/readyz")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["reasons"] == ["database unavailable"]
+
+
+@pytest.mark.anyio
+async def test_readyz_saturated_pool(async_client: AsyncClient, mocker):
+    mocker.patch(
+        "socialapi.routers.health.pool_stats",
+        return_value={"size": 10, "in_use": 10, "max_size": 10, "utilization": 1.0},
+    )
+
+    response = await async_client.get("/readyz")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["reasons"] == ["connection pool saturated"]
@@ -3,6 +3,8 @@ from fastapi import status
 from httpx import AsyncClient
 
 from socialapi import security
+from socialapi.background import background_work
+from socialapi.ranking import refresh_post_scores
 from socialapi.tests.helper import create_comment, create_post, like_post
 
 
@@ -93,6 +95,8 @@ async def test_get_all_posts_sort_likes(
     await create_post("Test Post 1", async_client, logged_in_token)
     await create_post("Test Post 2", async_client, logged_in_token)
     await like_post(1, async_client, logged_in_token)  # Like post 1 once
+    # Popular order comes from the scheduled ranking job
+    await refresh_post_scores()
 
     response = await async_client.get("/post", params={"sorting": "popular"})
     assert response.status_code == status.HTTP_200_OK
@@ -103,6 +107,44 @@ async def test_get_all_posts_sort_likes(
     assert post_ids == expected_order
 
 
+# Popular posts are a page of the top scores, unliked posts fill the rest
+@pytest.mark.anyio
+async def test_get_all_posts_sort_likes_limit(
+    async_client: AsyncClient,
+    logged_in_token: str,
+):
+    for body in ("Test Post 1", "Test Post 2", "Test Post 3"):
+        await create_post(body, async_client, logged_in_token)
+    await like_post(2, async_client, logged_in_token)
+    await refresh_post_scores()
+
+    response = await async_client.get(
+        "/post", params={"sorting": "popular", "limit": 2}
+    )
+
+    assert [(post["id"], post["likes"]) for post in response.json()] == [
+        (2, 1),
+        (3, 0),
+    ]
+
+
+# Every sorting returns a page of at most limit posts
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "sorting, expected_ids",
+    [("recent", [3, 2]), ("oldest", [1, 2]), ("popular", [3, 2])],
+)
+async def test_get_all_posts_limit(
+    async_client: AsyncClient, logged_in_token: str, sorting: str, expected_ids
+):
+    for body in ("Test Post 1", "Test Post 2", "Test Post 3"):
+        await create_post(body, async_client, logged_in_token)
+
+    response = await async_client.get("/post", params={"sorting": sorting, "limit": 2})
+
+    assert [post["id"] for post in response.json()] == expected_ids
+
+
 # Test wrong post sorting option
 @pytest.mark.anyio
 async def test_get_all_posts_invalid_sorting(async_client: AsyncClient):
@@ -158,6 +200,8 @@ async def test_create_post_with_prompt(
         "body": body,
         "image_url": None,
     }.items() <= response.json().items()
+    # The image is generated after the response
+    assert await background_work.wait(timeout=1)
     mock_generate_cute_creature_api.assert_called()  # Ensure the mock was called
 
 
@@ -283,3 +327,155 @@ async def test_like_post(
         headers={"Authorization": f"Bearer {logged_in_token}"},
     )
     assert response.status_code == 201
+
+
+# --- Test batch endpoints ----
+
+
+@pytest.mark.anyio
+async def test_like_posts_batch(
+    async_client: AsyncClient,
+    created_post: dict,
+    logged_in_token: str,
+):
+    response = await async_client.post(
+        "/like/batch",
+        json={"likes": [{"post_id": created_post["id"]}, {"post_id": 999}]},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["status_code"] for item in response.json()] == [201, 404]
+
+    # Only the like for the existing post is stored
+    response = await async_client.get(f"/post/{created_post['id']}")
+    assert response.json()["post"]["likes"] == 1
+
+
+@pytest.mark.anyio
+async def test_create_comments_batch(
+    async_client: AsyncClient,
+    created_post: dict,
+    logged_in_token: str,
+):
+    response = await async_client.post(
+        "/comment/batch",
+        json={
+            "comments": [
+                {"body": "First", "post_id": created_post["id"]},
+                {"body": "Second", "post_id": created_post["id"]},
+            ]
+        },
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["index"] for item in response.json()] == [0, 1]
+    assert [item["id"] for item in response.json()] == [1, 2]
+
+    response = await async_client.get(f"/post/{created_post['id']}/comments")
+    assert [comment["body"] for comment in response.json()] == ["First", "Second"]
+
+
+# Test empty batch is rejected
+@pytest.mark.anyio
+async def test_like_posts_batch_empty(async_client: AsyncClient, logged_in_token: str):
+    response = await async_client.post(
+        "/like/batch",
+        json={"likes": []},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+# --- Test unlike and liked state ----
+
+
+@pytest.mark.anyio
+async def test_unlike_post(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    await like_post(created_post["id"], async_client, logged_in_token)
+
+    response = await async_client.delete(
+        "/like",
+        params={"post_id": created_post["id"]},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = await async_client.get(f"/post/{created_post['id']}")
+    assert response.json()["post"]["likes"] == 0
+
+
+@pytest.mark.anyio
+async def test_unlike_post_not_liked(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    response = await async_client.delete(
+        "/like",
+        params={"post_id": created_post["id"]},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# liked_by_me is only returned to logged-in users
+@pytest.mark.anyio
+async def test_get_all_posts_liked_by_me(
+    async_client: AsyncClient, logged_in_token: str
+):
+    await create_post("Test Post 1", async_client, logged_in_token)
+    await create_post("Test Post 2", async_client, logged_in_token)
+    await like_post(1, async_client, logged_in_token)
+
+    response = await async_client.get(
+        "/post", headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+    liked = {post["id"]: post["liked_by_me"] for post in response.json()}
+    assert liked == {1: True, 2: False}
+
+    response = await async_client.get("/post")
+    assert "liked_by_me" not in response.json()[0]
+
+
+# A stale token on a public listing reads it anonymously instead of failing
+@pytest.mark.anyio
+async def test_get_all_posts_expired_token(
+    async_client: AsyncClient, created_post: dict, confirmed_user: dict, mocker
+):
+    mocker.patch("socialapi.security.access_token_expiry_minutes", return_value=-1)
+    token = security.create_access_token(confirmed_user["email"])
+
+    response = await async_client.get(
+        "/post", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "liked_by_me" not in response.json()[0]
+
+
+# --- Test user posts listing ----
+
+
+@pytest.mark.anyio
+async def test_get_user_posts(
+    async_client: AsyncClient, confirmed_user: dict, logged_in_token: str
+):
+    for i in range(3):
+        await create_post(f"Test Post {i}", async_client, logged_in_token)
+
+    response = await async_client.get(
+        f"/user/{confirmed_user['id']}/posts", params={"limit": 2}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [post["id"] for post in response.json()] == [3, 2]
+
+    response = await async_client.get(
+        f"/user/{confirmed_user['id']}/posts", params={"before": 2}
+    )
+    assert [post["id"] for post in response.json()] == [1]
+
+
+@pytest.mark.anyio
+async def test_get_user_posts_missing_user(async_client: AsyncClient):
+    response = await async_client.get("/user/999/posts")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
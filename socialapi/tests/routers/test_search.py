@@ -0,0 +1,70 @@
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from socialapi.tests.helper import create_comment, create_post
+
+
+@pytest.mark.anyio
+async def test_search_posts_and_comments(
+    async_client: AsyncClient, logged_in_token: str
+):
+    post = await create_post("Cats are great", async_client, logged_in_token)
+    await create_post("Dogs are fine", async_client, logged_in_token)
+    await create_comment("More cats please", post["id"], async_client, logged_in_token)
+
+    response = await async_client.get("/search", params={"q": "cats"})
+
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()["results"]
+    assert {(result["kind"], result["post_id"]) for result in results} == {
+        ("post", post["id"]),
+        ("comment", post["id"]),
+    }
+    assert response.json()["next_cursor"] is None
+
+
+# Pages follow each other without repeating results
+@pytest.mark.anyio
+async def test_search_pagination(async_client: AsyncClient, logged_in_token: str):
+    for i in range(3):
+        await create_post(f"Cat number {i}", async_client, logged_in_token)
+
+    response = await async_client.get("/search", params={"q": "cat", "limit": 2})
+    first_page = response.json()
+    assert len(first_page["results"]) == 2
+
+    response = await async_client.get(
+        "/search",
+        params={"q": "cat", "limit": 2, "cursor": first_page["next_cursor"]},
+    )
+    second_page = response.json()
+    assert len(second_page["results"]) == 1
+    assert second_page["next_cursor"] is None
+
+    ids = [r["ref_id"] for r in first_page["results"] + second_page["results"]]
+    assert sorted(ids) == [1, 2, 3]
+
+
+# FTS syntax characters in the query are treated as plain text
+@pytest.mark.anyio
+async def test_search_special_characters(
+    async_client: AsyncClient, logged_in_token: str
+):
+    await create_post('Say "hello" AND bye', async_client, logged_in_token)
+
+    response = await async_client.get("/search", params={"q": '"hello" AND ('})
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.anyio
+async def test_search_invalid_cursor(async_client: AsyncClient):
+    response = await async_client.get("/search", params={"q": "cat", "cursor": "x"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# A query of only whitespace has no terms to match
+@pytest.mark.anyio
+async def test_search_blank_query(async_client: AsyncClient):
+    response = await async_client.get("/search", params={"q": "   "})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
@@ -5,6 +5,8 @@ import pytest
 from fastapi import status
 from httpx import AsyncClient
 
+from socialapi.database import database, upload_table, user_table
+
 
 @pytest.fixture()
 def sample_image(fs) -> pathlib.Path:
@@ -26,6 +28,12 @@ def mock_b2_upload_file(mocker):
     )
 
 
+# Image processing runs in other processes, which can't see the fake filesystem
+@pytest.fixture(autouse=True)
+def mock_process_image(mocker):
+    return mocker.patch("socialapi.routers.upload.process_image", return_value={})
+
+
 @pytest.fixture(autouse=True)
 async def aiofiles_mock_open(mocker, fs):
     """Mock aiofiles.open to work with pyfakefs."""
@@ -49,16 +57,33 @@ async def aiofiles_mock_open(mocker, fs):
 
 # Helper function to call the upload endpoint
 async def call_upload_endpoint(
-    async_client: AsyncClient, token: str, sample_image: pathlib.Path
+    async_client: AsyncClient,
+    token: str,
+    sample_image: pathlib.Path,
+    params: dict | None = None,
 ):
     """Helper function to call the upload endpoint."""
     return await async_client.post(
         "/upload",
         files={"file": open(sample_image, "rb")},
+        params=params,
         headers={"Authorization": f"Bearer {token}"},
     )
 
 
+# Variant files as make_variants would leave them next to the upload
+@pytest.fixture()
+def image_variants(fs, mock_process_image, sample_image: pathlib.Path) -> dict:
+    variants = {
+        "thumbnail": str(sample_image) + ".thumbnail.jpg",
+        "display": str(sample_image) + ".display.jpg",
+    }
+    for path in variants.values():
+        fs.create_file(path)
+    mock_process_image.return_value = variants
+    return variants
+
+
 @pytest.mark.anyio
 async def test_upload_image(
     async_client: AsyncClient, logged_in_token: str, sample_image: pathlib.Path
@@ -66,3 +91,222 @@ async def test_upload_image(
     response = await call_upload_endpoint(async_client, logged_in_token, sample_image)
     assert response.status_code == status.HTTP_201_CREATED
     assert response.json()["file_url"] == "https://b2.fake.com"
+
+
+@pytest.mark.anyio
+async def test_upload_image_variants(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    sample_image: pathlib.Path,
+    image_variants: dict,
+    mock_b2_upload_file,
+):
+    response = await call_upload_endpoint(async_client, logged_in_token, sample_image)
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["thumbnail_url"] == "https://b2.fake.com"
+    assert response.json()["display_url"] == "https://b2.fake.com"
+    uploaded = [call.kwargs["file_name"] for call in mock_b2_upload_file.call_args_list]
+    assert uploaded == ["myfile.png", "myfile_thumbnail.jpg", "myfile_display.jpg"]
+    # Variant files are cleaned up after the upload
+    assert not any(pathlib.Path(path).exists() for path in image_variants.values())
+
+
+@pytest.mark.anyio
+async def test_upload_image_to_post(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    sample_image: pathlib.Path,
+    image_variants: dict,
+    created_post: dict,
+):
+    response = await call_upload_endpoint(
+        async_client, logged_in_token, sample_image, {"post_id": created_post["id"]}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    response = await async_client.get(f"/post/{created_post['id']}")
+    post = response.json()["post"]
+    assert post["image_url"] == "https://b2.fake.com"
+    assert post["thumbnail_url"] == "https://b2.fake.com"
+
+
+@pytest.mark.anyio
+async def test_upload_image_to_post_of_other_user(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    sample_image: pathlib.Path,
+    created_post: dict,
+    mock_b2_upload_file,
+):
+    await async_client.post(
+        "/register", json={"email": "other@example.com", "password": "NotSecure123!"}
+    )
+    await database.execute(
+        user_table.update()
+        .where(user_table.c.email == "other@example.com")
+        .values(confirmed=True)
+    )
+    response = await async_client.post(
+        "/token",
+        data={"username": "other@example.com", "password": "NotSecure123!"},
+    )
+
+    response = await call_upload_endpoint(
+        async_client,
+        response.json()["access_token"],
+        sample_image,
+        {"post_id": created_post["id"]},
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    mock_b2_upload_file.assert_not_called()
+
+
+# The same content is only sent to B2 once
+@pytest.mark.anyio
+async def test_upload_same_file_twice(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    sample_image: pathlib.Path,
+    mock_b2_upload_file,
+    mock_process_image,
+):
+    first = await call_upload_endpoint(async_client, logged_in_token, sample_image)
+    second = await call_upload_endpoint(async_client, logged_in_token, sample_image)
+
+    assert second.status_code == status.HTTP_201_CREATED
+    assert second.json()["file_url"] == first.json()["file_url"]
+    assert mock_b2_upload_file.call_count == 1
+    assert mock_process_image.call_count == 1
+    row = await database.fetch_one(upload_table.select())
+    assert row.file_url == "https://b2.fake.com"
+
+
+@pytest.mark.anyio
+async def test_upload_different_files(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    sample_image: pathlib.Path,
+    mock_b2_upload_file,
+):
+    await call_upload_endpoint(async_client, logged_in_token, sample_image)
+    sample_image.write_bytes(b"different content")
+    await call_upload_endpoint(async_client, logged_in_token, sample_image)
+
+    assert mock_b2_upload_file.call_count == 2
+
+
+# --- Limits ---
+@pytest.mark.anyio
+async def test_upload_unsupported_content_type(
+    async_client: AsyncClient, logged_in_token: str, mock_b2_upload_file
+):
+    response = await async_client.post(
+        "/upload",
+        files={"file": ("notes.txt", b"hello", "text/plain")},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    mock_b2_upload_file.assert_not_called()
+
+
+# The file type is refused from the part headers, not after the whole body
+@pytest.mark.anyio
+async def test_upload_unsupported_content_type_streamed(
+    async_client: AsyncClient, logged_in_token: str, mock_b2_upload_file
+):
+    chunks_sent = 0
+
+    async def body():
+        nonlocal chunks_sent
+        yield (
+            b"--boundary\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="setup.exe"\r\n'
+            b"Content-Type: application/octet-stream\r\n\r\n"
+        )
+        for _ in range(100):
+            chunks_sent += 1
+            yield b"x" * 500
+        yield b"\r\n--boundary--\r\n"
+
+    response = await async_client.post(
+        "/upload",
+        content=body(),
+        headers={
+            "Authorization": f"Bearer {logged_in_token}",
+            "Content-Type": "multipart/form-data; boundary=boundary",
+        },
+    )
+
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    assert chunks_sent < 100
+    mock_b2_upload_file.assert_not_called()
+
+
+# A declared Content-Length over the limit is refused before reading the body
+@pytest.mark.anyio
+async def test_upload_too_large(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    sample_image: pathlib.Path,
+    mock_b2_upload_file,
+    mocker,
+):
+    mocker.patch("socialapi.upload_limits.config.UPLOAD_MAX_BYTES", 1000)
+    sample_image.write_bytes(b"x" * 2000)
+
+    response = await call_upload_endpoint(async_client, logged_in_token, sample_image)
+
+    assert response.status_code == status.HTTP_413_CONTENT_TOO_LARGE
+    mock_b2_upload_file.assert_not_called()
+
+
+# Without Content-Length the body is cut off once it crosses the limit
+@pytest.mark.anyio
+async def test_upload_too_large_streamed(
+    async_client: AsyncClient, logged_in_token: str, mock_b2_upload_file, mocker
+):
+    mocker.patch("socialapi.upload_limits.config.UPLOAD_MAX_BYTES", 1000)
+    chunks_sent = 0
+
+    async def body():
+        nonlocal chunks_sent
+        yield (
+            b"--boundary\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="big.png"\r\n'
+            b"Content-Type: image/png\r\n\r\n"
+        )
+        for _ in range(100):
+            chunks_sent += 1
+            yield b"x" * 500
+        yield b"\r\n--boundary--\r\n"
+
+    response = await async_client.post(
+        "/upload",
+        content=body(),
+        headers={
+            "Authorization": f"Bearer {logged_in_token}",
+            "Content-Type": "multipart/form-data; boundary=boundary",
+        },
+    )
+
+    assert response.status_code == status.HTTP_413_CONTENT_TOO_LARGE
+    assert chunks_sent < 100
+    mock_b2_upload_file.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_upload_too_many_concurrent(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    sample_image: pathlib.Path,
+    mocker,
+):
+    mocker.patch("socialapi.upload_limits.config.UPLOAD_MAX_CONCURRENT", 0)
+
+    response = await call_upload_endpoint(async_client, logged_in_token, sample_image)
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "5"
@@ -0,0 +1,139 @@
+import hashlib
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+CHUNK = 10
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(mocker):
+    mocker.patch("socialapi.routers.upload_session.config.UPLOAD_CHUNK_BYTES", CHUNK)
+
+
+@pytest.fixture(autouse=True)
+def mock_b2(mocker):
+    def upload_part(file_id, part_number, data):
+        return hashlib.sha1(data).hexdigest()
+
+    return {
+        "start": mocker.patch(
+            "socialapi.routers.upload_session.b2_start_large_file",
+            return_value="b2-file-id",
+        ),
+        "part": mocker.patch(
+            "socialapi.routers.upload_session.b2_upload_part",
+            side_effect=upload_part,
+        ),
+        "finish": mocker.patch(
+            "socialapi.routers.upload_session.b2_finish_large_file",
+            return_value="https://b2.fake.com/video.mp4",
+        ),
+    }
+
+
+async def create_session(async_client: AsyncClient, token: str, size: int = 25) -> dict:
+    response = await async_client.post(
+        "/upload/sessions",
+        json={"file_name": "video.mp4", "content_type": "video/mp4", "size": size},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    return response
+
+
+async def put_chunk(
+    async_client: AsyncClient, token: str, session_id: str, number: int, data: bytes
+):
+    return await async_client.put(
+        f"/upload/sessions/{session_id}/chunks/{number}",
+        content=data,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+
+@pytest.mark.anyio
+async def test_resumable_upload(
+    async_client: AsyncClient, logged_in_token: str, mock_b2
+):
+    content = b"0123456789abcdefghijKLMNO"
+    response = await create_session(async_client, logged_in_token)
+    assert response.status_code == status.HTTP_201_CREATED
+    session = response.json()
+    assert session["part_count"] == 3
+    assert session["parts_received"] == []
+
+    await put_chunk(async_client, logged_in_token, session["id"], 1, content[:10])
+    await put_chunk(async_client, logged_in_token, session["id"], 3, content[20:])
+
+    # After a dropped connection the client asks what is missing
+    response = await async_client.get(
+        f"/upload/sessions/{session['id']}",
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.json()["parts_received"] == [1, 3]
+
+    response = await async_client.post(
+        f"/upload/sessions/{session['id']}/complete",
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.json()["detail"] == "Missing chunks: 2"
+
+    await put_chunk(async_client, logged_in_token, session["id"], 2, content[10:20])
+    response = await async_client.post(
+        f"/upload/sessions/{session['id']}/complete",
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["file_url"] == "https://b2.fake.com/video.mp4"
+    mock_b2["finish"].assert_called_once_with(
+        "b2-file-id",
+        [hashlib.sha1(content[i : i + 10]).hexdigest() for i in (0, 10, 20)],
+    )
+
+
+@pytest.mark.anyio
+async def test_upload_chunk_wrong_size(async_client: AsyncClient, logged_in_token: str):
+    session = (await create_session(async_client, logged_in_token)).json()
+
+    response = await put_chunk(
+        async_client, logged_in_token, session["id"], 1, b"too short"
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.anyio
+async def test_upload_chunk_out_of_range(
+    async_client: AsyncClient, logged_in_token: str
+):
+    session = (await create_session(async_client, logged_in_token)).json()
+
+    response = await put_chunk(async_client, logged_in_token, session["id"], 4, b"x")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# Files that fit in one chunk use POST /upload
+@pytest.mark.anyio
+async def test_create_session_small_file(
+    async_client: AsyncClient, logged_in_token: str, mock_b2
+):
+    response = await create_session(async_client, logged_in_token, size=CHUNK)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    mock_b2["start"].assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_upload_session_not_found(
+    async_client: AsyncClient, logged_in_token: str
+):
+    response = await async_client.get(
+        "/upload/sessions/unknown",
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
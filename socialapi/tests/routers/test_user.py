@@ -1,7 +1,10 @@
 import pytest
-from fastapi import BackgroundTasks, status
+from fastapi import status
 from httpx import AsyncClient
 
+from socialapi import security
+from socialapi.background import background_work
+
 
 async def register_user(async_client: AsyncClient, email: str, password: str):
     return await async_client.post(
@@ -31,7 +34,7 @@ async def test_register_existing_user(async_client: AsyncClient, registered_user
 @pytest.mark.anyio
 async def test_confirm_user(async_client: AsyncClient, mocker):
     # spy allow us to look at a function call without changing its behavior
-    spy = mocker.spy(BackgroundTasks, "add_task")
+    spy = mocker.spy(background_work, "add")
 
     await register_user(async_client, "test@example.com", "NotSecure123!")
 
@@ -58,7 +61,7 @@ async def test_confirm_user_invalid_token(async_client: AsyncClient):
 @pytest.mark.anyio
 async def test_confirm_user_expired_token(async_client: AsyncClient, mocker):
     mocker.patch("socialapi.security.confirm_token_expiry_minutes", return_value=-1)
-    spy = mocker.spy(BackgroundTasks, "add_task")
+    spy = mocker.spy(background_work, "add")
 
     await register_user(async_client, "test@example.com", "NotSecure123!")
 
@@ -109,3 +112,151 @@ async def test_login_user_unconfirmed(async_client: AsyncClient, registered_user
         },
     )
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# --- Refresh tokens and logout ---
+async def login(async_client: AsyncClient, user: dict) -> dict:
+    response = await async_client.post(
+        "/token", data={"username": user["email"], "password": user["password"]}
+    )
+    return response.json()
+
+
+@pytest.mark.anyio
+async def test_refresh_token(async_client: AsyncClient, confirmed_user: dict):
+    tokens = await login(async_client, confirmed_user)
+
+    response = await async_client.post(
+        "/token/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["refresh_token"] != tokens["refresh_token"]
+
+    # The old refresh token was rotated out
+    response = await async_client.post(
+        "/token/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json()["detail"] == "Token has been revoked"
+
+
+# A refresh token consumed by another worker is rejected before its sync
+@pytest.mark.anyio
+async def test_refresh_token_used_elsewhere(
+    async_client: AsyncClient, confirmed_user: dict
+):
+    tokens = await login(async_client, confirmed_user)
+    payload = security.get_payload_for_token_type(tokens["refresh_token"], "refresh")
+    await security.RevocationList().revoke(payload)
+
+    response = await async_client.post(
+        "/token/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json()["detail"] == "Token has been revoked"
+
+
+# An access token can't be used as a refresh token
+@pytest.mark.anyio
+async def test_refresh_token_wrong_type(
+    async_client: AsyncClient, confirmed_user: dict
+):
+    tokens = await login(async_client, confirmed_user)
+
+    response = await async_client.post(
+        "/token/refresh", json={"refresh_token": tokens["access_token"]}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.anyio
+async def test_logout(async_client: AsyncClient, confirmed_user: dict):
+    tokens = await login(async_client, confirmed_user)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    response = await async_client.post(
+        "/logout", json={"refresh_token": tokens["refresh_token"]}, headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await async_client.post("/post", json={"body": "Hi"}, headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = await async_client.post(
+        "/token/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# Attempts over the per-username limit are rejected before bcrypt runs
+@pytest.mark.anyio
+async def test_login_rate_limited(
+    async_client: AsyncClient, confirmed_user: dict, mocker
+):
+    mocker.patch("socialapi.ratelimit.config.LOGIN_RATE_LIMIT_USER_BURST", 1)
+    spy = mocker.spy(security, "verify_password")
+    data = {"username": confirmed_user["email"], "password": "WrongPassword!"}
+
+    response = await async_client.post("/token", data=data)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = await async_client.post("/token", data=data)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert "Retry-After" in response.headers
+    assert spy.call_count == 1
+
+
+# --- Resend confirmation ---
+@pytest.mark.anyio
+async def test_resend_confirmation(
+    async_client: AsyncClient, registered_user: dict, mocker
+):
+    # Registration already sent one, so the cooldown has to be over
+    mocker.patch("socialapi.task.config.EMAIL_RESEND_COOLDOWN_SECONDS", 0)
+    spy = mocker.spy(background_work, "add")
+
+    response = await async_client.post(
+        "/resend-confirmation", json={"email": registered_user["email"]}
+    )
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert spy.call_count == 1
+
+
+# Retries within the cooldown don't send the email again
+@pytest.mark.anyio
+async def test_resend_confirmation_deduplicated(
+    async_client: AsyncClient, registered_user: dict, mocker
+):
+    spy = mocker.spy(background_work, "add")
+
+    for _ in range(3):
+        response = await async_client.post(
+            "/resend-confirmation", json={"email": registered_user["email"]}
+        )
+        assert response.status_code == status.HTTP_202_ACCEPTED
+
+    assert spy.call_count == 0
+
+
+@pytest.mark.anyio
+async def test_resend_confirmation_unknown_email(async_client: AsyncClient, mocker):
+    spy = mocker.spy(background_work, "add")
+
+    response = await async_client.post(
+        "/resend-confirmation", json={"email": "nobody@example.com"}
+    )
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert spy.call_count == 0
+
+
+# No new accounts once shutdown started, their confirmation email would be lost
+@pytest.mark.anyio
+async def test_register_rejected_while_draining(async_client: AsyncClient, mocker):
+    mocker.patch.object(background_work, "draining", True)
+
+    response = await register_user(async_client, "test@example.com", "NotSecure123!")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert await security.get_user("test@example.com") is None
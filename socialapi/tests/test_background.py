@@ -0,0 +1,66 @@
+import asyncio
+import signal
+
+import pytest
+from fastapi import HTTPException
+
+from socialapi.background import BackgroundWork
+
+
+@pytest.mark.anyio
+async def test_drain_waits_for_pending_work():
+    work = BackgroundWork()
+    finished = []
+
+    async def send():
+        await asyncio.sleep(0.05)
+        finished.append(True)
+
+    # Runs on its own, not as part of the request that scheduled it
+    work.add(send)
+    assert work.pending == 1
+
+    assert await work.drain(timeout=1)
+    assert finished == [True]
+    assert work.pending == 0
+
+
+@pytest.mark.anyio
+async def test_drain_timeout_cancels_running_work():
+    work = BackgroundWork()
+    task = work.add(asyncio.sleep, 10)
+
+    assert not await work.drain(timeout=0.01)
+    assert task.cancelled()
+    assert work.pending == 0
+
+
+@pytest.mark.anyio
+async def test_rejects_work_while_draining():
+    work = BackgroundWork()
+    work.draining = True
+
+    with pytest.raises(HTTPException) as exc_info:
+        work.add(asyncio.sleep, 0)
+
+    assert exc_info.value.status_code == 503
+    assert work.pending == 0
+
+
+# The server's own handler still runs after draining starts
+def test_drain_on_shutdown_signal():
+    work = BackgroundWork()
+    received = []
+    original_sigint = signal.getsignal(signal.SIGINT)
+    original_sigterm = signal.signal(
+        signal.SIGTERM, lambda sig, frame: received.append(sig)
+    )
+    try:
+        work.drain_on_shutdown_signal()
+        signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+    finally:
+        signal.signal(signal.SIGINT, original_sigint)
+        signal.signal(signal.SIGTERM, original_sigterm)
+
+    assert work.draining
+    assert received == [signal.SIGTERM]
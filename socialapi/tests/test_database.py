@@ -0,0 +1,39 @@
+import sqlite3
+
+import pytest
+from databases import Database
+
+from socialapi.config import config
+from socialapi.database import (
+    insert_unless_exists,
+    post_table,
+    sqlite_pragmas,
+    upload_table,
+)
+
+
+# Every SQLite connection is opened with the configured PRAGMAs
+@pytest.mark.anyio
+async def test_sqlite_pragmas_applied(db: Database):
+    assert (await db.fetch_val("PRAGMA journal_mode")).upper() == (
+        config.SQLITE_JOURNAL_MODE
+    )
+    assert await db.fetch_val("PRAGMA synchronous") == 1  # NORMAL
+    assert await db.fetch_val("PRAGMA cache_size") == config.SQLITE_CACHE_SIZE
+    assert await db.fetch_val("PRAGMA busy_timeout") == config.SQLITE_BUSY_TIMEOUT_MS
+
+
+# busy_timeout is set before journal_mode, which needs a lock to switch
+def test_sqlite_pragmas_busy_timeout_first():
+    assert sqlite_pragmas()[0].startswith("PRAGMA busy_timeout=")
+
+
+# A duplicate key is reported, other integrity errors still raise
+@pytest.mark.anyio
+async def test_insert_unless_exists(db: Database):
+    query = upload_table.insert().values(sha256="abc", size=1, file_url="url")
+    assert await insert_unless_exists(query)
+    assert not await insert_unless_exists(query)
+
+    with pytest.raises(sqlite3.IntegrityError):
+        await insert_unless_exists(post_table.insert().values(body="No author"))
@@ -0,0 +1,108 @@
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from socialapi.database import database, post_table
+from socialapi.idempotency import claim_key
+
+
+async def create_post_with_key(
+    async_client: AsyncClient, token: str, key: str, path: str = "/post"
+):
+    return await async_client.post(
+        path,
+        json={"body": "Retried post"},
+        headers={"Authorization": f"Bearer {token}", "Idempotency-Key": key},
+    )
+
+
+@pytest.mark.anyio
+async def test_retry_replays_response(async_client: AsyncClient, logged_in_token: str):
+    first = await create_post_with_key(async_client, logged_in_token, "key-1")
+    retry = await create_post_with_key(async_client, logged_in_token, "key-1")
+
+    assert first.status_code == retry.status_code == status.HTTP_201_CREATED
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    # The post was only inserted once
+    assert len(await database.fetch_all(post_table.select())) == 1
+
+
+@pytest.mark.anyio
+async def test_different_keys_are_independent(
+    async_client: AsyncClient, logged_in_token: str
+):
+    await create_post_with_key(async_client, logged_in_token, "key-1")
+    await create_post_with_key(async_client, logged_in_token, "key-2")
+
+    assert len(await database.fetch_all(post_table.select())) == 2
+
+
+# Failed requests are not stored, the retry runs again
+@pytest.mark.anyio
+async def test_failed_request_not_stored(
+    async_client: AsyncClient, logged_in_token: str
+):
+    response = await async_client.post(
+        "/comment",
+        json={"body": "On a missing post", "post_id": 999},
+        headers={"Authorization": f"Bearer {logged_in_token}", "Idempotency-Key": "k"},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    assert await claim_key("test@example.com", "k", "/comment") is None
+
+
+@pytest.mark.anyio
+async def test_key_in_progress(async_client: AsyncClient, logged_in_token: str):
+    await claim_key("test@example.com", "key-1", "/post")
+
+    response = await create_post_with_key(async_client, logged_in_token, "key-1")
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+
+# A claim left behind by a crashed request is free once its lease is over
+@pytest.mark.anyio
+async def test_abandoned_claim_expires(
+    async_client: AsyncClient, logged_in_token: str, mocker
+):
+    await claim_key("test@example.com", "key-1", "/post")
+    mocker.patch("socialapi.idempotency.config.IDEMPOTENCY_LEASE_SECONDS", 0)
+
+    response = await create_post_with_key(async_client, logged_in_token, "key-1")
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.anyio
+async def test_key_reused_with_another_body(
+    async_client: AsyncClient, logged_in_token: str
+):
+    await create_post_with_key(async_client, logged_in_token, "key-1")
+
+    response = await async_client.post(
+        "/post",
+        json={"body": "A different post"},
+        headers={
+            "Authorization": f"Bearer {logged_in_token}",
+            "Idempotency-Key": "key-1",
+        },
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+    assert len(await database.fetch_all(post_table.select())) == 1
+
+
+@pytest.mark.anyio
+async def test_key_reused_for_another_path(
+    async_client: AsyncClient, logged_in_token: str, created_post: dict
+):
+    await create_post_with_key(async_client, logged_in_token, "key-1")
+
+    response = await async_client.post(
+        "/like",
+        json={"post_id": created_post["id"]},
+        headers={
+            "Authorization": f"Bearer {logged_in_token}",
+            "Idempotency-Key": "key-1",
+        },
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
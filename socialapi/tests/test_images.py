@@ -0,0 +1,29 @@
+import pytest
+
+from socialapi.libs.images import make_variants, variant_file_name
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def test_make_variants(tmp_path):
+    path = tmp_path / "photo.png"
+    Image.new("RGBA", (3000, 1500), "red").save(path)
+
+    variants = make_variants(str(path), {"thumbnail": 320, "display": 1600}, 80)
+
+    with Image.open(variants["thumbnail"]) as thumbnail:
+        assert thumbnail.format == "JPEG"
+        assert thumbnail.size == (320, 160)
+    with Image.open(variants["display"]) as display:
+        assert display.size == (1600, 800)
+
+
+def test_make_variants_not_an_image(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("not an image")
+
+    assert make_variants(str(path), {"thumbnail": 320}, 80) == {}
+
+
+def test_variant_file_name():
+    assert variant_file_name("cat.png", "thumbnail") == "cat_thumbnail.jpg"
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from socialapi.database import database, like_table
+from socialapi.like_buffer import LikeBuffer, like_buffer
+
+
+# Enable the write-behind buffer for a test
+@pytest.fixture()
+def buffered_likes(mocker):
+    mocker.patch("socialapi.routers.post.config.LIKE_BUFFER_ENABLED", True)
+    yield like_buffer
+    like_buffer._pending.clear()
+
+
+async def count_likes() -> int:
+    return len(await database.fetch_all(like_table.select()))
+
+
+@pytest.mark.anyio
+async def test_like_buffer_deduplicates(created_post: dict, confirmed_user: dict):
+    buffer = LikeBuffer(max_size=10)
+    await buffer.add(created_post["id"], confirmed_user["id"])
+    await buffer.add(created_post["id"], confirmed_user["id"])
+
+    assert len(buffer) == 1
+    assert buffer.pending_counts() == {created_post["id"]: 1}
+
+
+@pytest.mark.anyio
+async def test_like_buffer_flush(created_post: dict, confirmed_user: dict):
+    buffer = LikeBuffer(max_size=10)
+    await buffer.add(created_post["id"], confirmed_user["id"])
+
+    assert await buffer.flush() == 1
+    assert len(buffer) == 0
+    assert await count_likes() == 1
+
+
+# Reaching max_size flushes without waiting for the timer
+@pytest.mark.anyio
+async def test_like_buffer_flush_on_size(created_post: dict, confirmed_user: dict):
+    buffer = LikeBuffer(max_size=1)
+    await buffer.add(created_post["id"], confirmed_user["id"])
+
+    assert len(buffer) == 0
+    assert await count_likes() == 1
+
+
+@pytest.mark.anyio
+async def test_like_post_buffered(
+    async_client: AsyncClient,
+    created_post: dict,
+    logged_in_token: str,
+    buffered_likes: LikeBuffer,
+):
+    response = await async_client.post(
+        "/like",
+        json={"post_id": created_post["id"]},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == 202
+    assert await count_likes() == 0
+
+    # Reads see the pending like merged into the count
+    response = await async_client.get("/post")
+    assert response.json()[0]["likes"] == 1
+
+
+# An unlike racing a flush sees the row the flush wrote, not a missing like
+@pytest.mark.anyio
+async def test_like_buffer_discard_waits_for_flush(
+    created_post: dict, confirmed_user: dict
+):
+    buffer = LikeBuffer(max_size=10)
+    await buffer.add(created_post["id"], confirmed_user["id"])
+
+    async with buffer._lock:
+        discard = asyncio.create_task(
+            buffer.discard(created_post["id"], confirmed_user["id"])
+        )
+        await asyncio.sleep(0)
+        assert not discard.done()
+        # Stand-in for a flush that has written the batch but not yet dropped it
+        await database.execute(
+            like_table.insert().values(
+                post_id=created_post["id"], user_id=confirmed_user["id"]
+            )
+        )
+        buffer._pending.clear()
+
+    assert await discard is False
+    assert await count_likes() == 1
@@ -0,0 +1,88 @@
+import sqlalchemy
+
+from socialapi import database, migrate
+
+# Shape of the schema created by the old import-time create_all
+LEGACY_SCHEMA = [
+    (
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR UNIQUE, "
+        "password VARCHAR, confirmed BOOLEAN)"
+    ),
+    (
+        "CREATE TABLE post (id INTEGER PRIMARY KEY, body VARCHAR, "
+        "user_id INTEGER NOT NULL, image_url VARCHAR)"
+    ),
+    (
+        "CREATE TABLE likes (id INTEGER PRIMARY KEY, post_id INTEGER NOT NULL, "
+        "user_id INTEGER NOT NULL)"
+    ),
+    "INSERT INTO users (id, email) VALUES (1, 'test@example.com')",
+    "INSERT INTO post (id, body, user_id) VALUES (1, 'Test Post', 1)",
+    "INSERT INTO likes (id, post_id, user_id) VALUES (1, 1, 1)",
+]
+
+
+def test_upgrade_fresh_database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'fresh.db'}"
+
+    assert migrate.upgrade(url) == sorted(migrate.MIGRATIONS)
+    assert migrate.upgrade(url) == []
+
+    engine = migrate.create_engine(url)
+    tables = sqlalchemy.inspect(engine).get_table_names()
+    engine.dispose()
+    assert {"users", "post", "likes", "search_index", "schema_version"} <= set(tables)
+
+
+# The migrations, which don't import the models, end up with the same columns
+# and indexes
+def test_migrations_match_models(tmp_path):
+    url = f"sqlite:///{tmp_path / 'models.db'}"
+    migrate.upgrade(url)
+
+    engine = migrate.create_engine(url)
+    inspector = sqlalchemy.inspect(engine)
+    for table in database.metadata.sorted_tables:
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        assert columns == set(table.columns.keys()), table.name
+        indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        assert indexes == {index.name for index in table.indexes}, table.name
+    engine.dispose()
+
+
+# Later schema changes belong to later migrations, not the baseline
+def test_baseline_is_a_snapshot(tmp_path):
+    engine = migrate.create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+
+    migrate.MIGRATIONS[1](engine)
+
+    inspector = sqlalchemy.inspect(engine)
+    assert "thumbnail_url" not in {c["name"] for c in inspector.get_columns("post")}
+    assert "uploads" not in inspector.get_table_names()
+    engine.dispose()
+
+
+def test_upgrade_legacy_database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    engine = migrate.create_engine(url)
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.execute(sqlalchemy.text(statement))
+
+    migrate.upgrade(url)
+
+    inspector = sqlalchemy.inspect(engine)
+    assert "follower_count" in {c["name"] for c in inspector.get_columns("users")}
+    assert "ix_likes_user_id_post_id" in {
+        i["name"] for i in inspector.get_indexes("likes")
+    }
+    with engine.connect() as connection:
+        created_at = connection.scalar(sqlalchemy.text("SELECT created_at FROM likes"))
+    assert created_at is not None
+    with engine.connect() as connection:
+        indexed = connection.execute(
+            sqlalchemy.text("SELECT kind, ref_id, post_id, body FROM search_index")
+        ).all()
+    assert indexed == [("post", 1, 1, "Test Post")]
+    assert migrate.pending_versions(engine) == []
+    engine.dispose()
@@ -0,0 +1,85 @@
+import datetime
+
+import pytest
+
+from socialapi.database import database, like_table, post_score_table
+from socialapi.ranking import add_log2, like_weight, refresh_post_scores
+from socialapi.tests.helper import create_post
+
+
+async def insert_like(post_id: int, user_id: int, days_ago: float) -> None:
+    liked_at = datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=days_ago)
+    query = like_table.insert().values(
+        post_id=post_id, user_id=user_id, created_at=liked_at
+    )
+    await database.execute(query)
+
+
+async def get_scores() -> dict[int, float]:
+    rows = await database.fetch_all(post_score_table.select())
+    return {row.post_id: row.score for row in rows}
+
+
+def test_add_log2():
+    assert add_log2(None, 3.0) == 3.0
+    assert add_log2(1.0, 1.0) == pytest.approx(2.0)
+
+
+# A like one half-life older weighs half as much
+def test_like_weight_half_life(mocker):
+    mocker.patch("socialapi.ranking.config.RANKING_HALF_LIFE_HOURS", 24.0)
+    now = datetime.datetime.now(datetime.UTC)
+    assert like_weight(now) - like_weight(
+        now - datetime.timedelta(hours=24)
+    ) == pytest.approx(1.0)
+
+
+# Recent likes outrank more numerous old likes
+@pytest.mark.anyio
+async def test_refresh_post_scores_decay(
+    async_client, logged_in_token: str, confirmed_user: dict
+):
+    old_post = await create_post("Old news", async_client, logged_in_token)
+    new_post = await create_post("Trending", async_client, logged_in_token)
+    for _ in range(3):
+        await insert_like(old_post["id"], confirmed_user["id"], days_ago=10)
+    await insert_like(new_post["id"], confirmed_user["id"], days_ago=0)
+
+    assert await refresh_post_scores() == 4
+
+    scores = await get_scores()
+    assert scores[new_post["id"]] > scores[old_post["id"]]
+
+
+# Later runs only process likes added since the previous run
+@pytest.mark.anyio
+async def test_refresh_post_scores_incremental(
+    async_client, logged_in_token: str, confirmed_user: dict
+):
+    post = await create_post("Post", async_client, logged_in_token)
+    await insert_like(post["id"], confirmed_user["id"], days_ago=0)
+    await refresh_post_scores()
+    first_score = (await get_scores())[post["id"]]
+
+    assert await refresh_post_scores() == 0
+
+    await insert_like(post["id"], confirmed_user["id"], days_ago=0)
+    assert await refresh_post_scores() == 1
+    assert (await get_scores())[post["id"]] == pytest.approx(first_score + 1, abs=1e-3)
+
+
+# Likes inside the settle window, and any after them, wait for a later run
+@pytest.mark.anyio
+async def test_refresh_post_scores_waits_for_settle_window(
+    async_client, logged_in_token: str, confirmed_user: dict, mocker
+):
+    mocker.patch("socialapi.ranking.config.RANKING_SETTLE_SECONDS", 60)
+    post = await create_post("Post", async_client, logged_in_token)
+    await insert_like(post["id"], confirmed_user["id"], days_ago=1)
+    await insert_like(post["id"], confirmed_user["id"], days_ago=0)
+    await insert_like(post["id"], confirmed_user["id"], days_ago=1)
+
+    assert await refresh_post_scores() == 1
+
+    mocker.patch("socialapi.ranking.config.RANKING_SETTLE_SECONDS", 0)
+    assert await refresh_post_scores() == 2
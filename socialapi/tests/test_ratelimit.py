@@ -0,0 +1,118 @@
+import pytest
+from fastapi import HTTPException
+
+from socialapi.ratelimit import (
+    InMemoryRateLimitStore,
+    check_login_rate_limit,
+    metrics,
+    take_token,
+)
+
+
+@pytest.mark.anyio
+async def test_token_bucket_burst_and_refill(mocker):
+    store = InMemoryRateLimitStore()
+    clock = mocker.patch("socialapi.ratelimit.time.monotonic", return_value=0)
+
+    assert await store.take("key", capacity=2, refill_per_second=1) == 0
+    assert await store.take("key", capacity=2, refill_per_second=1) == 0
+    # Bucket is empty, one token comes back after a second
+    assert await store.take("key", capacity=2, refill_per_second=1) == 1
+
+    clock.return_value = 1
+    assert await store.take("key", capacity=2, refill_per_second=1) == 0
+
+
+@pytest.mark.anyio
+async def test_token_bucket_evict(mocker):
+    store = InMemoryRateLimitStore()
+    clock = mocker.patch("socialapi.ratelimit.time.monotonic", return_value=0)
+    await store.take("key", capacity=1, refill_per_second=1)
+
+    clock.return_value = 100
+    await store.evict(idle_seconds=10)
+
+    assert store._buckets == {}
+
+
+@pytest.mark.anyio
+async def test_take_token_metrics():
+    before = metrics["test.rejected"]
+    await take_token("test", "key", burst=1, per_minute=1)
+    await take_token("test", "key", burst=1, per_minute=1)
+
+    assert metrics["test.rejected"] == before + 1
+
+
+# Without a client address only the per-username bucket applies
+@pytest.mark.anyio
+async def test_login_rate_limit_without_client_ip(mocker):
+    mocker.patch("socialapi.ratelimit.config.LOGIN_RATE_LIMIT_USER_BURST", 1)
+    before = metrics["login_ip.allowed"]
+
+    await check_login_rate_limit(None, "test@example.com")
+    with pytest.raises(HTTPException):
+        await check_login_rate_limit(None, "test@example.com")
+
+    assert metrics["login_ip.allowed"] == before
+
+
+@pytest.mark.anyio
+async def test_gcra(mocker):
+    store = InMemoryRateLimitStore()
+    clock = mocker.patch("socialapi.ratelimit.time.monotonic", return_value=0)
+
+    # A burst of 2, then one request every 10 seconds
+    assert await store.take_gcra("key", emission_interval=10, burst=2) == 0
+    assert await store.take_gcra("key", emission_interval=10, burst=2) == 0
+    assert await store.take_gcra("key", emission_interval=10, burst=2) == 10
+
+    clock.return_value = 10
+    assert await store.take_gcra("key", emission_interval=10, burst=2) == 0
+
+    # Once the arrival time has passed the key holds no information
+    clock.return_value = 100
+    await store.evict(idle_seconds=3600)
+    assert store._arrival_times == {}
+
+
+@pytest.mark.anyio
+async def test_write_rate_limit(async_client, logged_in_token: str, mocker):
+    mocker.patch("socialapi.ratelimit.config.WRITE_RATE_LIMITS", {"/post": 1})
+    mocker.patch("socialapi.ratelimit.config.WRITE_RATE_LIMIT_BURST", 1)
+
+    responses = [
+        await async_client.post(
+            "/post",
+            json={"body": "Spam"},
+            headers={"Authorization": f"Bearer {logged_in_token}"},
+        )
+        for _ in range(2)
+    ]
+
+    assert [response.status_code for response in responses] == [201, 429]
+    assert responses[1].headers["Retry-After"] == "60"
+
+
+# Resumable upload chunks have their own limit instead of the /upload one
+@pytest.mark.anyio
+async def test_write_rate_limit_most_specific_route(
+    async_client, logged_in_token: str, mocker
+):
+    mocker.patch(
+        "socialapi.ratelimit.config.WRITE_RATE_LIMITS",
+        {"/upload": 1, "/upload/sessions": 60_000},
+    )
+    mocker.patch("socialapi.ratelimit.config.WRITE_RATE_LIMIT_BURST", 1)
+
+    responses = [
+        await async_client.put(
+            "/upload/sessions/unknown/chunks/1",
+            content=b"x",
+            headers={"Authorization": f"Bearer {logged_in_token}"},
+        )
+        for _ in range(2)
+    ]
+
+    # Not limited by /upload: both reach the route, which knows no such session
+    assert [response.status_code for response in responses] == [404, 404]
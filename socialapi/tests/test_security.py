@@ -125,6 +125,16 @@ async def test_authenticate_user_not_found():
         await security.authenticate_user("test@example.com", "password")
 
 
+# unknown users still pay for a bcrypt verification
+@pytest.mark.anyio
+async def test_authenticate_user_not_found_verifies_dummy_hash(mocker):
+    spy = mocker.spy(security, "verify_password")
+    with pytest.raises(security.HTTPException):
+        await security.authenticate_user("test@example.com", "password")
+
+    spy.assert_called_once_with("password", security.get_dummy_hash())
+
+
 # test authenticating user with wrong password
 @pytest.mark.anyio
 async def test_authenticate_user_wrong_password(registered_user: dict):
@@ -153,3 +163,107 @@ async def test_get_current_user_invalid_token_type(registered_user: dict):
     token = security.create_confirmation_token(registered_user["email"])
     with pytest.raises(security.HTTPException):
         await security.get_current_user(token)
+
+
+# --- Verified token cache tests ---
+def test_decode_token_cached(mocker):
+    security.token_cache.clear()
+    token = security.create_access_token("test@example.com")
+    spy = mocker.spy(security.jwt, "decode")
+
+    security.get_subject_for_token_type(token, "access")
+    security.get_subject_for_token_type(token, "access")
+
+    # The second call is served from the cache
+    assert spy.call_count == 1
+
+
+def test_token_cache_honors_expiry(mocker):
+    cache = security.TokenCache(max_size=10)
+    cache.set("token", {"sub": "test@example.com", "exp": 100})
+
+    mocker.patch("socialapi.security.time.time", return_value=99)
+    assert cache.get("token") is not None
+
+    mocker.patch("socialapi.security.time.time", return_value=100)
+    assert cache.get("token") is None
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = security.TokenCache(max_size=2)
+    far_future = 2**40
+    cache.set("a", {"exp": far_future})
+    cache.set("b", {"exp": far_future})
+    cache.get("a")
+    cache.set("c", {"exp": far_future})
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+
+
+# --- Revocation list tests ---
+@pytest.mark.anyio
+async def test_revocation_list_sync():
+    token = security.create_refresh_token("test@example.com")
+    payload = security.get_payload_for_token_type(token, "refresh")
+
+    await security.RevocationList().revoke(payload)
+
+    # Another worker's list picks up the revocation from the table
+    revocation_list = security.RevocationList()
+    assert not revocation_list.is_revoked(payload["jti"])
+    await revocation_list.sync()
+    assert revocation_list.is_revoked(payload["jti"])
+
+
+# A revocation made while sync() awaits the table survives the sync
+@pytest.mark.anyio
+async def test_revocation_list_sync_keeps_concurrent_revoke(mocker):
+    token = security.create_refresh_token("test@example.com")
+    payload = security.get_payload_for_token_type(token, "refresh")
+    revocation_list = security.RevocationList()
+    fetch_all = security.database.fetch_all
+
+    async def fetch_all_then_revoke(query):
+        rows = await fetch_all(query)
+        await revocation_list.revoke(payload)
+        return rows
+
+    mocker.patch.object(security.database, "fetch_all", fetch_all_then_revoke)
+    await revocation_list.sync()
+
+    assert revocation_list.is_revoked(payload["jti"])
+
+
+# Only the first revocation of a token wins, even across workers
+@pytest.mark.anyio
+async def test_revocation_list_revoke_once():
+    token = security.create_refresh_token("test@example.com")
+    payload = security.get_payload_for_token_type(token, "refresh")
+
+    assert await security.RevocationList().revoke(payload)
+    assert not await security.RevocationList().revoke(payload)
+
+
+# A hash with an outdated cost is upgraded on successful login
+@pytest.mark.anyio
+async def test_authenticate_user_rehashes_password(confirmed_user: dict, mocker):
+    mocker.patch.object(
+        security,
+        "pwd_context",
+        security.build_crypt_context(
+            ["bcrypt"],
+            bcrypt_rounds=5,
+            argon2_time_cost=3,
+            argon2_memory_cost=65536,
+            argon2_parallelism=4,
+        ),
+    )
+
+    await security.authenticate_user(
+        confirmed_user["email"], confirmed_user["password"]
+    )
+
+    user = await security.get_user(confirmed_user["email"])
+    assert user.password.startswith("$2b$05$")
+    assert security.verify_password(confirmed_user["password"], user.password)
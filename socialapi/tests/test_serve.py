@@ -0,0 +1,37 @@
+from socialapi import serve
+
+
+def test_server_options_defaults(mocker):
+    mocker.patch("socialapi.serve.config.SERVER_WORKERS", None)
+    mocker.patch("socialapi.serve.os.cpu_count", return_value=6)
+    mocker.patch("socialapi.serve.has_module", return_value=True)
+
+    options = serve.server_options()
+
+    assert options["workers"] == 6
+    assert options["loop"] == "uvloop"
+    assert options["http"] == "httptools"
+    assert options["lifespan"] == "on"
+    # Client IPs come from the load balancer's X-Forwarded-For
+    assert options["proxy_headers"]
+    assert options["forwarded_allow_ips"] == serve.config.SERVER_FORWARDED_ALLOW_IPS
+
+
+def test_server_options_fallbacks(mocker):
+    mocker.patch("socialapi.serve.has_module", return_value=False)
+
+    options = serve.server_options(workers=2, port=9000)
+
+    assert options["workers"] == 2
+    assert options["port"] == 9000
+    assert options["loop"] == "asyncio"
+    assert options["http"] == "h11"
+
+
+def test_main_runs_import_string_for_several_workers(mocker):
+    run = mocker.patch("socialapi.serve.uvicorn.run")
+
+    serve.main(["--workers", "3"])
+
+    assert run.call_args.args == (serve.APP,)
+    assert run.call_args.kwargs["workers"] == 3
@@ -7,6 +7,7 @@ from socialapi.database import post_table
 from socialapi.task import (
     APIResponseError,
     _generate_cute_creature_api,
+    claim_email_send,
     generate_and_add_to_post,
     send_simple_email,
 )
@@ -111,3 +112,11 @@ async def test_generate_and_add_to_post_success(
 
 
 # Test generate_and_add_to_post with DeepAI API error
+
+
+# Only the first claim within the cooldown is allowed
+@pytest.mark.anyio
+async def test_claim_email_send(db: Database):
+    assert await claim_email_send("test@example.com", "confirmation", db)
+    assert not await claim_email_send("test@example.com", "confirmation", db)
+    assert await claim_email_send("test@example.com", "other", db)
@@ -0,0 +1,64 @@
+import datetime
+
+import pytest
+from databases import Database
+
+from socialapi.database import upload_part_table, upload_session_table
+from socialapi.upload_sessions import (
+    check_chunk_size,
+    expected_part_size,
+    purge_expired_upload_sessions,
+)
+
+
+class Session:
+    size = 25
+    chunk_size = 10
+
+
+def test_expected_part_size():
+    assert expected_part_size(Session, 1) == 10
+    assert expected_part_size(Session, 3) == 5
+
+
+# Unfinished sessions past their TTL are cancelled in B2 and removed
+# Chunks become B2 parts, which have a minimum size
+def test_check_chunk_size(mocker):
+    check_chunk_size()
+
+    mocker.patch("socialapi.upload_sessions.config.UPLOAD_CHUNK_BYTES", 1024)
+    with pytest.raises(ValueError):
+        check_chunk_size()
+
+
+@pytest.mark.anyio
+async def test_purge_expired_upload_sessions(
+    db: Database, confirmed_user: dict, mocker
+):
+    cancel = mocker.patch("socialapi.upload_sessions.b2_cancel_large_file")
+    now = datetime.datetime.now(datetime.UTC)
+    for session_id, age in [("old", 2), ("new", 0)]:
+        await db.execute(
+            upload_session_table.insert().values(
+                id=session_id,
+                user_id=confirmed_user["id"],
+                file_name="video.mp4",
+                content_type="video/mp4",
+                size=25,
+                chunk_size=10,
+                b2_file_id=f"b2-{session_id}",
+                created_at=now - datetime.timedelta(days=age),
+            )
+        )
+    await db.execute(
+        upload_part_table.insert().values(
+            session_id="old", part_number=1, size=10, sha1="sha1"
+        )
+    )
+
+    assert await purge_expired_upload_sessions() == 1
+
+    cancel.assert_called_once_with("b2-old")
+    rows = await db.fetch_all(upload_session_table.select())
+    assert [row.id for row in rows] == ["new"]
+    assert await db.fetch_all(upload_part_table.select()) == []
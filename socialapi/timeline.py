@@ -0,0 +1,144 @@
+import logging
+
+import sqlalchemy
+
+from socialapi.config import config
+from socialapi.database import (
+    database,
+    follow_table,
+    post_table,
+    timeline_table,
+    user_table,
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Home timelines ---
+# New posts are copied into the timeline of every follower (fan-out-on-write), so
+# reading a timeline is a single range read on (user_id, post_id). Authors with
+# more than TIMELINE_FANOUT_MAX_FOLLOWERS followers are skipped on write and
+# their posts are merged in when the timeline is read (fan-out-on-read).
+
+
+def uses_fan_out_on_read(author) -> bool:
+    return author.follower_count > config.TIMELINE_FANOUT_MAX_FOLLOWERS
+
+
+async def fan_out_post(post_id: int, author) -> None:
+    # Authors always see their own posts
+    await database.execute(
+        timeline_table.insert().values(
+            user_id=author.id, post_id=post_id, author_id=author.id
+        )
+    )
+    if uses_fan_out_on_read(author):
+        logger.debug(f"Skipping fan-out for post {post_id}, author has many followers")
+        return
+
+    followers = sqlalchemy.select(
+        follow_table.c.follower_id,
+        sqlalchemy.literal(post_id),
+        sqlalchemy.literal(author.id),
+    ).where(follow_table.c.followee_id == author.id)
+    query = timeline_table.insert().from_select(
+        ["user_id", "post_id", "author_id"], followers
+    )
+    logger.debug(f"Executing query: {query}")
+    await database.execute(query)
+
+
+async def is_following(follower_id: int, followee_id: int) -> bool:
+    query = follow_table.select().where(
+        follow_table.c.follower_id == follower_id,
+        follow_table.c.followee_id == followee_id,
+    )
+    return await database.fetch_one(query) is not None
+
+
+async def follow(follower_id: int, followee) -> None:
+    async with database.transaction():
+        await database.execute(
+            follow_table.insert().values(
+                follower_id=follower_id, followee_id=followee.id
+            )
+        )
+        await database.execute(
+            user_table.update()
+            .where(user_table.c.id == followee.id)
+            .values(follower_count=user_table.c.follower_count + 1)
+        )
+
+        # Fill the timeline with the most recent posts of the new followee
+        if not uses_fan_out_on_read(followee):
+            recent_posts = (
+                sqlalchemy.select(
+                    sqlalchemy.literal(follower_id),
+                    post_table.c.id,
+                    post_table.c.user_id,
+                )
+                .where(post_table.c.user_id == followee.id)
+                .order_by(post_table.c.id.desc())
+                .limit(config.TIMELINE_BACKFILL_POSTS)
+            )
+            await database.execute(
+                timeline_table.insert().from_select(
+                    ["user_id", "post_id", "author_id"], recent_posts
+                )
+            )
+
+
+async def unfollow(follower_id: int, followee_id: int) -> None:
+    async with database.transaction():
+        await database.execute(
+            follow_table.delete().where(
+                follow_table.c.follower_id == follower_id,
+                follow_table.c.followee_id == followee_id,
+            )
+        )
+        await database.execute(
+            user_table.update()
+            .where(user_table.c.id == followee_id)
+            .values(follower_count=user_table.c.follower_count - 1)
+        )
+        await database.execute(
+            timeline_table.delete().where(
+                timeline_table.c.user_id == follower_id,
+                timeline_table.c.author_id == followee_id,
+            )
+        )
+
+
+# Newest first post ids of a timeline page, before is the last id of the previous page
+async def get_timeline_post_ids(
+    user_id: int, limit: int, before: int | None = None
+) -> list[int]:
+    query = (
+        sqlalchemy.select(timeline_table.c.post_id)
+        .where(timeline_table.c.user_id == user_id)
+        .order_by(timeline_table.c.post_id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        query = query.where(timeline_table.c.post_id < before)
+    post_ids = {row.post_id for row in await database.fetch_all(query)}
+
+    # Posts from followed authors that were not fanned out on write
+    read_time_authors = (
+        sqlalchemy.select(follow_table.c.followee_id)
+        .join(user_table, user_table.c.id == follow_table.c.followee_id)
+        .where(
+            follow_table.c.follower_id == user_id,
+            user_table.c.follower_count > config.TIMELINE_FANOUT_MAX_FOLLOWERS,
+        )
+    )
+    query = (
+        sqlalchemy.select(post_table.c.id)
+        .where(post_table.c.user_id.in_(read_time_authors))
+        .order_by(post_table.c.id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        query = query.where(post_table.c.id < before)
+    post_ids |= {row.id for row in await database.fetch_all(query)}
+
+    return sorted(post_ids, reverse=True)[:limit]
@@ -0,0 +1,151 @@
+import logging
+from typing import Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.datastructures import Headers
+
+from socialapi.config import config
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_METHODS = {"POST", "PUT"}
+
+
+def is_upload(scope) -> bool:
+    return (
+        scope["type"] == "http"
+        and scope["method"] in UPLOAD_METHODS
+        and scope["path"].rstrip("/").split("/")[:2] == ["", "upload"]
+    )
+
+
+def too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        detail=f"Upload is larger than {config.UPLOAD_MAX_BYTES} bytes",
+    )
+
+
+def unsupported_type(content_type: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail=f"Unsupported file type {content_type}",
+    )
+
+
+# Follows a multipart body as it streams in and reports the first file part
+# whose Content-Type isn't allowed, as soon as that part's headers arrive
+class PartTypeChecker:
+    def __init__(self, boundary: bytes) -> None:
+        self.field = b""
+        self.value = b""
+        self.headers: dict[bytes, bytes] = {}
+        self.rejected: Optional[str] = None
+        self.parser: Optional[MultipartParser] = MultipartParser(
+            boundary,
+            {
+                "on_part_begin": self.on_part_begin,
+                "on_header_field": self.on_header_field,
+                "on_header_value": self.on_header_value,
+                "on_header_end": self.on_header_end,
+                "on_headers_finished": self.on_headers_finished,
+            },
+        )
+
+    def on_part_begin(self) -> None:
+        self.headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self.headers[self.field.lower()] = self.value
+        self.field = self.value = b""
+
+    def on_headers_finished(self) -> None:
+        _, disposition = parse_options_header(self.headers.get(b"content-disposition"))
+        if b"filename" not in disposition or self.rejected:
+            return  # a plain form field
+        content_type = self.headers.get(b"content-type", b"").decode("latin-1")
+        if content_type not in config.UPLOAD_ALLOWED_CONTENT_TYPES:
+            self.rejected = content_type
+
+    def feed(self, chunk: bytes) -> Optional[str]:
+        if self.parser is not None:
+            try:
+                self.parser.write(chunk)
+            except Exception:
+                # Malformed body, Starlette's own parser reports it
+                self.parser = None
+        return self.rejected
+
+
+def part_type_checker(scope) -> Optional[PartTypeChecker]:
+    content_type, options = parse_options_header(
+        Headers(scope=scope).get("content-type")
+    )
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        return None
+    return PartTypeChecker(options[b"boundary"])
+
+
+class UploadLimitMiddleware:
+    """Bound the size and number of uploads in flight on this worker.
+
+    The multipart body is parsed before the route runs, so the limits have to
+    be enforced here: a Content-Length over UPLOAD_MAX_BYTES is refused
+    before reading anything, and a body that turns out larger is cut off as
+    soon as it crosses the limit. A file part with a content type outside
+    UPLOAD_ALLOWED_CONTENT_TYPES is refused when its headers arrive. Uploads
+    beyond UPLOAD_MAX_CONCURRENT get 503 instead of queueing on disk and memory.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.active = 0
+
+    async def __call__(self, scope, receive, send) -> None:
+        if not is_upload(scope):
+            return await self.app(scope, receive, send)
+
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > config.UPLOAD_MAX_BYTES:
+            exc = too_large()
+            response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+            return await response(scope, receive, send)
+
+        if self.active >= config.UPLOAD_MAX_CONCURRENT:
+            logger.warning(f"Rejecting upload, {self.active} already in progress")
+            response = JSONResponse(
+                {"detail": "Too many uploads in progress, please retry"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "5"},
+            )
+            return await response(scope, receive, send)
+
+        received = 0
+        checker = part_type_checker(scope)
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                received += len(body)
+                # FastAPI re-raises HTTPExceptions from reading the body
+                if received > config.UPLOAD_MAX_BYTES:
+                    raise too_large()
+                if checker and (rejected := checker.feed(body)) is not None:
+                    raise unsupported_type(rejected)
+            return message
+
+        self.active += 1
+        try:
+            await self.app(scope, limited_receive, send)
+        finally:
+            self.active -= 1
@@ -0,0 +1,83 @@
+import datetime
+import logging
+import math
+
+from starlette.concurrency import run_in_threadpool
+
+from socialapi.config import config
+from socialapi.database import database, upload_part_table, upload_session_table
+from socialapi.libs.b2 import B2_MIN_PART_SIZE, b2_cancel_large_file
+
+logger = logging.getLogger(__name__)
+
+# --- Resumable uploads ---
+# A session is a B2 large file. The client PUTs chunks numbered from 1, each
+# stored right away as the B2 part with the same number and recorded in
+# upload_part, so after a network failure only missing chunks are resent.
+
+
+# B2 refuses every part but the last below its minimum size, which would only
+# show up when a client finishes an upload. Checked once at startup instead.
+def check_chunk_size() -> None:
+    if config.UPLOAD_CHUNK_BYTES < B2_MIN_PART_SIZE:
+        raise ValueError(
+            f"UPLOAD_CHUNK_BYTES must be at least {B2_MIN_PART_SIZE} bytes, "
+            "the smallest part B2 accepts"
+        )
+
+
+def part_count(size: int, chunk_size: int) -> int:
+    return math.ceil(size / chunk_size)
+
+
+# Every chunk is chunk_size bytes except the last one
+def expected_part_size(session, part_number: int) -> int:
+    if part_number < part_count(session.size, session.chunk_size):
+        return session.chunk_size
+    return session.size - session.chunk_size * (part_number - 1)
+
+
+async def get_parts(session_id: str) -> list:
+    query = (
+        upload_part_table.select()
+        .where(upload_part_table.c.session_id == session_id)
+        .order_by(upload_part_table.c.part_number)
+    )
+    return await database.fetch_all(query)
+
+
+async def delete_session(session_id: str) -> None:
+    async with database.transaction():
+        await database.execute(
+            upload_part_table.delete().where(
+                upload_part_table.c.session_id == session_id
+            )
+        )
+        await database.execute(
+            upload_session_table.delete().where(upload_session_table.c.id == session_id)
+        )
+
+
+# Drop sessions older than UPLOAD_SESSION_TTL_SECONDS. Unfinished ones are
+# cancelled in B2 too, so their parts stop taking storage.
+async def purge_expired_upload_sessions() -> int:
+    cutoff = datetime.datetime.now(datetime.UTC) - datetime.timedelta(
+        seconds=config.UPLOAD_SESSION_TTL_SECONDS
+    )
+    query = upload_session_table.select().where(
+        upload_session_table.c.created_at < cutoff
+    )
+    sessions = await database.fetch_all(query)
+    for session in sessions:
+        if session.file_url is None:
+            try:
+                await run_in_threadpool(b2_cancel_large_file, session.b2_file_id)
+            except Exception:
+                # Retried on the next run
+                logger.exception(f"Could not cancel upload session {session.id}")
+                continue
+        await delete_session(session.id)
+
+    if sessions:
+        logger.debug(f"Purged {len(sessions)} expired upload sessions")
+    return len(sessions)